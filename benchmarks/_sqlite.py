@@ -0,0 +1,36 @@
+"""SQLite DDL shims so the services' Postgres schemas run in-process.
+
+bets and transactions use a composite (id, created_at) primary key for
+range partitioning. SQLite cannot autoincrement a composite key, so the
+benchmarks render id as the rowid and keep the pair as a UNIQUE constraint.
+now() is rendered with microseconds so server defaults round-trip like
+Postgres timestamps.
+"""
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn, PrimaryKeyConstraint
+from sqlalchemy.sql import functions
+
+
+def _rowid_table(table) -> bool:
+    pk = list(table.primary_key.columns)
+    return len(pk) > 1 and pk[0].name == "id" and pk[0].autoincrement is True
+
+
+@compiles(CreateColumn, "sqlite")
+def _create_column(element, compiler, **kw):
+    column = element.element
+    if column.name == "id" and _rowid_table(column.table):
+        return "id INTEGER PRIMARY KEY AUTOINCREMENT"
+    return compiler.visit_create_column(element, **kw)
+
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _primary_key(constraint, compiler, **kw):
+    if _rowid_table(constraint.table):
+        return "UNIQUE (%s)" % ", ".join(c.name for c in constraint.columns)
+    return compiler.visit_primary_key_constraint(constraint, **kw)
+
+
+@compiles(functions.now, "sqlite")
+def _now(element, compiler, **kw):
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
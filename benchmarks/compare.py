@@ -0,0 +1,82 @@
+"""Compare two benchmarks.harness result files.
+
+    python -m benchmarks.compare base.json head.json --fail-over 10
+
+Prints p50/p95/p99 and throughput per scenario and endpoint with the relative
+change from base to head. With --fail-over, exits non-zero when any p95 grows
+or any scenario throughput drops by more than that many percent.
+"""
+import argparse
+import json
+import sys
+
+COLUMNS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def change(base: float, head: float):
+    if not base:
+        return None
+    return (head - base) / base * 100
+
+
+def format_cell(base: float, head: float) -> str:
+    delta = change(base, head)
+    suffix = f" ({delta:+.1f}%)" if delta is not None else ""
+    return f"{base:.2f} -> {head:.2f}{suffix}"
+
+
+def compare(base: dict, head: dict, fail_over: float = None):
+    rows = []
+    regressions = []
+    for scenario, head_result in head["scenarios"].items():
+        base_result = base["scenarios"].get(scenario)
+        if base_result is None:
+            continue
+        delta = change(base_result["throughput_rps"], head_result["throughput_rps"])
+        if fail_over is not None and delta is not None and delta < -fail_over:
+            regressions.append(f"{scenario}: throughput {delta:+.1f}%")
+        for endpoint, head_stats in head_result["endpoints"].items():
+            base_stats = base_result["endpoints"].get(endpoint)
+            if base_stats is None:
+                continue
+            rows.append(
+                [scenario, endpoint]
+                + [format_cell(base_stats[c], head_stats[c]) for c in COLUMNS]
+            )
+            delta = change(base_stats["p95_ms"], head_stats["p95_ms"])
+            if fail_over is not None and delta is not None and delta > fail_over:
+                regressions.append(f"{scenario} {endpoint}: p95 {delta:+.1f}%")
+    return rows, regressions
+
+
+def print_table(rows: list):
+    header = ["scenario", "endpoint", *COLUMNS]
+    widths = [max(len(str(row[i])) for row in [header, *rows]) for i in range(len(header))]
+    for row in [header, *rows]:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--fail-over", type=float, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base['meta'].get('revision')}  head {head['meta'].get('revision')}")
+    rows, regressions = compare(base, head, args.fail_over)
+    print_table(rows)
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Bet ingestion benchmark for bets_service group commit.
+
+Writes the same burst of bets twice against a fresh database: once with one
+transaction per bet (crud.create_bet, the default path) and once through the
+group-commit writer, with --concurrency callers submitting at a time.
+
+    python -m benchmarks.group_commit --bets 5000 --concurrency 200
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.group_commit
+
+SQLite serializes writers, so the Postgres numbers are the ones that matter.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from ._support import load_service, summarize
+
+
+async def burst(write, bets: int, concurrency: int, make_item):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await write(make_item(index))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(bets)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def reset(engine, models):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+
+
+async def run(args, database_url: str):
+    load_service("bets", database_url)
+    from bets_service.app import crud, ingest, models, schemas
+    from bets_service.app.database import async_session, engine
+
+    def make_item(index: int) -> dict:
+        return {
+            "bet": schemas.BetCreate(
+                match_id=1 + index % 10,
+                outcome=("win_home", "draw", "win_away")[index % 3],
+                amount_staked=10,
+            ),
+            "user_id": 1 + index % args.users,
+            "odds_on_bet": 2.5,
+            "wallet_id": 1 + index % args.users,
+            "idempotency_key": f"bench-{index}",
+        }
+
+    async def single(item: dict):
+        async with async_session() as db:
+            return await crud.create_bet(db=db, **item)
+
+    writer = ingest.GroupCommitWriter(async_session, args.max_batch, args.max_delay_ms / 1000)
+
+    async def grouped(item: dict):
+        return await writer.submit(**item)
+
+    results = {}
+    for name, write in (("per_bet_commit", single), ("group_commit", grouped)):
+        await reset(engine, models)
+        results[name] = await burst(write, args.bets, args.concurrency, make_item)
+    await writer.close()
+    await engine.dispose()
+
+    single_rps = results["per_bet_commit"]["throughput_rps"]
+    grouped_rps = results["group_commit"]["throughput_rps"]
+    return {
+        "config": {
+            "bets": args.bets,
+            "concurrency": args.concurrency,
+            "max_batch": args.max_batch,
+            "max_delay_ms": args.max_delay_ms,
+            "database": database_url.split("://")[0],
+        },
+        **results,
+        "group_commit_batches": writer.batches,
+        "speedup": round(grouped_rps / single_rps, 2) if single_rps else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bets", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--max-batch", type=int, default=100)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        print(json.dumps(asyncio.run(run(args, database_url)), indent=2))
+        return
+    # SQLite allows one writer at a time; queue on the pool instead of
+    # failing with "database is locked".
+    os.environ.setdefault("DB_POOL_SIZE", "1")
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+    os.environ.setdefault("DB_POOL_TIMEOUT", "300")
+    with tempfile.TemporaryDirectory() as tmp:
+        result = asyncio.run(run(args, f"sqlite+aiosqlite:///{tmp}/bets.db"))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
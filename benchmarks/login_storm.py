@@ -0,0 +1,107 @@
+"""Login storm benchmark for user_service.
+
+Runs user_service in-process on a temporary SQLite database and measures
+the latency of a cheap endpoint while many logins run concurrently.
+
+    python -m benchmarks.login_storm --logins 200 --concurrency 50
+
+Set PASSWORD_HASH_WORKERS=0 to hash on the event loop for comparison.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from ._support import load_service, summarize
+
+EMAIL = "storm@example.com"
+PASSWORD = "storm-password"
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float):
+    # Latency is measured from the scheduled send time, so event loop stalls
+    # show up in the numbers instead of silently delaying the next probe.
+    latencies = []
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        await client.get("/")
+        latencies.append(time.perf_counter() - scheduled)
+        scheduled += interval
+    return latencies
+
+
+async def login_storm(client: httpx.AsyncClient, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = Counter()
+
+    async def login():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/token", data={"username": EMAIL, "password": PASSWORD}
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = load_service("user", f"sqlite+aiosqlite:///{tmp}/user.db")
+        from common import passwords
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://user_service", timeout=None
+            ) as client:
+                await client.post("/users/", json={"email": EMAIL, "password": PASSWORD})
+
+                stop = asyncio.Event()
+                idle_probe = asyncio.create_task(probe(client, stop, args.probe_interval))
+                await asyncio.sleep(args.idle_seconds)
+                stop.set()
+                idle = await idle_probe
+
+                stop = asyncio.Event()
+                storm_probe = asyncio.create_task(probe(client, stop, args.probe_interval))
+                latencies, statuses, elapsed = await login_storm(
+                    client, args.logins, args.concurrency
+                )
+                stop.set()
+                during = await storm_probe
+
+    return {
+        "config": {
+            "logins": args.logins,
+            "concurrency": args.concurrency,
+            "password_hash_workers": passwords.hasher.workers,
+            "password_hash_queue": passwords.hasher.max_queue,
+        },
+        "login": {**summarize(latencies, elapsed), "statuses": dict(statuses)},
+        "probe_idle": summarize(idle),
+        "probe_during_storm": summarize(during),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--idle-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Local OTLP/HTTP collector stand-in and trace report.
+
+Accepts OTLP/HTTP JSON on /v1/traces and appends every span as one JSON line,
+in the same shape TRACE_EXPORTER=file writes, so both can be inspected with
+the report mode:
+
+    python -m benchmarks.otlp_collector --port 4318 --output spans.ndjson
+    TRACE_EXPORTER=otlp TRACE_OTLP_ENDPOINT=http://localhost:4318 uvicorn ...
+    python -m benchmarks.otlp_collector --report spans.ndjson --top 5
+
+The report prints the slowest traces as span trees with per-span durations,
+which shows which hop a tail-latency request spent its time in.
+"""
+import argparse
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _attribute_value(value: dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("stringValue", "doubleValue", "boolValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def flatten(payload: dict) -> list:
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        resource = {
+            attribute["key"]: _attribute_value(attribute["value"])
+            for attribute in resource_spans.get("resource", {}).get("attributes", [])
+        }
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                start_ns = int(span["startTimeUnixNano"])
+                end_ns = int(span["endTimeUnixNano"])
+                status = span.get("status", {})
+                spans.append(
+                    {
+                        "trace_id": span["traceId"],
+                        "span_id": span["spanId"],
+                        "parent_id": span.get("parentSpanId") or None,
+                        "name": span["name"],
+                        "kind": span.get("kind"),
+                        "service": resource.get("service.name", "unknown"),
+                        "start_ns": start_ns,
+                        "end_ns": end_ns,
+                        "duration_ms": round((end_ns - start_ns) / 1e6, 3),
+                        "attributes": {
+                            attribute["key"]: _attribute_value(attribute["value"])
+                            for attribute in span.get("attributes", [])
+                        },
+                        "error": status.get("message") if status.get("code") == 2 else None,
+                    }
+                )
+    return spans
+
+
+def serve(port: int, output: str):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/traces":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                spans = flatten(json.loads(body))
+            except (ValueError, KeyError) as e:
+                self.send_response(400)
+                self.end_headers()
+                self.wfile.write(str(e).encode())
+                return
+            with lock, open(output, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(span) + "\n")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    print(f"Collecting spans on :{port}/v1/traces into {output}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def report(path: str, top: int):
+    traces = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+
+    roots = []
+    for trace_id, spans in traces.items():
+        ids = {span["span_id"] for span in spans}
+        for span in spans:
+            if span["parent_id"] is None or span["parent_id"] not in ids:
+                roots.append(span)
+    roots.sort(key=lambda span: span["duration_ms"], reverse=True)
+
+    for root in roots[:top]:
+        children = defaultdict(list)
+        for span in traces[root["trace_id"]]:
+            children[span["parent_id"]].append(span)
+        print(f"trace {root['trace_id']}  {root['duration_ms']:.3f} ms")
+
+        def walk(span: dict, depth: int):
+            offset = (span["start_ns"] - root["start_ns"]) / 1e6
+            error = f"  ! {span['error']}" if span.get("error") else ""
+            print(
+                f"  {'  ' * depth}{span['service']}: {span['name']}"
+                f"  +{offset:.3f} ms  {span['duration_ms']:.3f} ms{error}"
+            )
+            for child in sorted(children[span["span_id"]], key=lambda s: s["start_ns"]):
+                walk(child, depth + 1)
+
+        walk(root, 0)
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="spans.ndjson")
+    parser.add_argument("--report", metavar="SPANS_FILE")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    if args.report:
+        report(args.report, args.top)
+    else:
+        serve(args.port, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Bet listing serialization benchmark for bets_service.
+
+Seeds a temporary SQLite database with bets for one match and pages
+through them twice: once the way the list endpoints used to (ORM entities,
+pydantic from_attributes validation, stdlib json) and once through the
+column-only crud query and orjson.
+
+    python -m benchmarks.serialization --rows 100000 --page-size 1000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+from ._support import load_service
+
+MATCH_ID = 1
+
+
+async def seed(db, models, rows: int):
+    start = datetime(2026, 1, 1)
+    for offset in range(0, rows, 5000):
+        await db.execute(
+            insert(models.Bet),
+            [
+                {
+                    "id": bet_id,
+                    "created_at": start + timedelta(seconds=bet_id),
+                    "user_id": bet_id % 997,
+                    "match_id": MATCH_ID,
+                    "outcome": ("win_home", "draw", "win_away")[bet_id % 3],
+                    "amount_staked": 10 + bet_id % 90,
+                    "odds_on_bet": 2.5,
+                    "status": "pending",
+                }
+                for bet_id in range(offset + 1, min(offset + 5000, rows) + 1)
+            ],
+        )
+    await db.commit()
+
+
+async def orm_page(db, models, adapter, after_id: int, limit: int):
+    query = select(models.Bet).filter(models.Bet.match_id == MATCH_ID)
+    if after_id is not None:
+        query = query.filter(models.Bet.id > after_id)
+    result = await db.execute(query.order_by(models.Bet.id).limit(limit))
+    bets = result.scalars().all()
+    # Mirrors FastAPI's response_model handling: validate, dump, json.dumps.
+    content = adapter.dump_python(
+        adapter.validate_python(bets, from_attributes=True), mode="json"
+    )
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+    db.expunge_all()
+    return body, bets[-1].id if len(bets) == limit else None
+
+
+async def row_page(db, crud, serialization, after_id: int, limit: int):
+    bets = await crud.get_bets_by_match(
+        db, match_id=MATCH_ID, after_id=after_id, limit=limit
+    )
+    body = serialization.rows_to_json(bets)
+    return body, bets[-1].id if len(bets) == limit else None
+
+
+async def measure(session_factory, fetch_page, page_size: int):
+    pages = 0
+    size = 0
+    elapsed = 0.0
+    after_id = None
+    async with session_factory() as db:
+        while True:
+            start = time.perf_counter()
+            body, after_id = await fetch_page(db, after_id, page_size)
+            elapsed += time.perf_counter() - start
+            pages += 1
+            size += len(body)
+            if after_id is None:
+                break
+    return {"pages": pages, "bytes": size, "seconds": elapsed}
+
+
+async def first_page(session_factory, fetch_page, page_size: int):
+    async with session_factory() as db:
+        tracemalloc.start()
+        body, _ = await fetch_page(db, None, page_size)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return body, peak
+
+
+def report(result: dict, rows: int) -> dict:
+    return {
+        "pages": result["pages"],
+        "bytes": result["bytes"],
+        "seconds": round(result["seconds"], 4),
+        "us_per_row": round(result["seconds"] / rows * 1e6, 3),
+        "peak_page_kib": round(result["peak"] / 1024, 1),
+    }
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        load_service("bets", f"sqlite+aiosqlite:///{tmp}/bets.db")
+        from bets_service.app import crud, models, schemas
+        from bets_service.app.database import async_session, engine
+        from common import serialization
+
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        async with async_session() as db:
+            await seed(db, models, args.rows)
+
+        adapter = TypeAdapter(List[schemas.Bet])
+
+        async def orm(db, after_id, limit):
+            return await orm_page(db, models, adapter, after_id, limit)
+
+        async def rows(db, after_id, limit):
+            return await row_page(db, crud, serialization, after_id, limit)
+
+        paths = {"orm_pydantic_json": orm, "rows_orjson": rows}
+        results = {}
+        bodies = {}
+        for name, fetch_page in paths.items():
+            bodies[name], peak = await first_page(async_session, fetch_page, args.page_size)
+            for _ in range(args.repeat):
+                result = await measure(async_session, fetch_page, args.page_size)
+                if name not in results or result["seconds"] < results[name]["seconds"]:
+                    results[name] = {**result, "peak": peak}
+        await engine.dispose()
+
+    orm_seconds = results["orm_pydantic_json"]["seconds"]
+    row_seconds = results["rows_orjson"]["seconds"]
+    return {
+        "config": {"rows": args.rows, "page_size": args.page_size, "repeat": args.repeat},
+        **{name: report(result, args.rows) for name, result in results.items()},
+        "speedup": round(orm_seconds / row_seconds, 2) if row_seconds else None,
+        "identical_output": bodies["orm_pydantic_json"] == bodies["rows_orjson"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from fastapi import Depends
+from common import auth
+from common.config import env_int, env_float
+
+BET_RATE_PER_SECOND = env_float("BET_RATE_PER_SECOND", 5.0)
+BET_RATE_BURST = env_int("BET_RATE_BURST", 10)
+BET_RATE_MAX_USERS = env_int("BET_RATE_MAX_USERS", 100000)
+BET_MAX_CONCURRENCY = env_int("BET_MAX_CONCURRENCY", 64)
+BET_MAX_QUEUE = env_int("BET_MAX_QUEUE", 128)
+BET_QUEUE_TIMEOUT = env_float("BET_QUEUE_TIMEOUT", 0.5)
+
+
+class AdmissionRejected(Exception):
+    status_code = 503
+    detail = "Service is overloaded"
+
+    def __init__(self, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimited(AdmissionRejected):
+    status_code = 429
+    detail = "Too many bets, slow down"
+
+
+class Overloaded(AdmissionRejected):
+    pass
+
+
+class TokenBuckets:
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.limited = 0
+        self._buckets = OrderedDict()
+
+    def acquire(self, key):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            self.limited += 1
+            raise RateLimited((1 - tokens) / self.rate)
+        self._buckets[key] = (tokens - 1, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tracked_users": len(self._buckets),
+            "limited": self.limited,
+        }
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            return
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.queue_timeout)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise Overloaded(self.queue_timeout)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+
+    def release(self):
+        if self._semaphore is None:
+            return
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+bet_rate = TokenBuckets(BET_RATE_PER_SECOND, BET_RATE_BURST, BET_RATE_MAX_USERS)
+bet_concurrency = ConcurrencyLimiter(BET_MAX_CONCURRENCY, BET_MAX_QUEUE, BET_QUEUE_TIMEOUT)
+
+
+async def admit_bet(current_user: auth.User = Depends(auth.get_current_user)):
+    bet_rate.acquire(current_user.id)
+    await bet_concurrency.acquire()
+    try:
+        yield
+    finally:
+        bet_concurrency.release()
+
+
+def stats() -> dict:
+    return {"rate": bet_rate.stats(), "concurrency": bet_concurrency.stats()}
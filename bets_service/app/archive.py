@@ -0,0 +1,237 @@
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, update, or_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import asyncio
+import gzip
+import heapq
+import json
+import logging
+import uuid
+from . import crud, models, schemas, partitions
+from common.config import env_str, env_int
+from common.writes import update_returning
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path(env_str("ARCHIVE_DIR", "/app_root/archive"))
+ARCHIVE_AFTER_DAYS = env_int("ARCHIVE_AFTER_DAYS", 90)
+ARCHIVE_BATCH_SIZE = env_int("ARCHIVE_BATCH_SIZE", 5000)
+ARCHIVE_INTERVAL_SECONDS = env_int("ARCHIVE_INTERVAL_SECONDS", 3600)
+ARCHIVE_LEASE_SECONDS = env_int("ARCHIVE_LEASE_SECONDS", 600)
+IDEMPOTENCY_KEY_TTL_HOURS = env_int("IDEMPOTENCY_KEY_TTL_HOURS", 24)
+ARCHIVE_LEASE_NAME = "bet-archive"
+
+SETTLED_STATUSES = ("won", "lost")
+
+_lease_owner = uuid.uuid4().hex
+
+
+def _user_dir(user_id: int) -> Path:
+    return ARCHIVE_DIR / "users" / str(user_id)
+
+
+def _record_key(record: dict) -> tuple:
+    return (str(record["bet"]["created_at"]), record["bet"]["id"])
+
+
+def _load_index(directory: Path) -> list:
+    path = directory / "index.json"
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_file(directory: Path, records: list):
+    directory.mkdir(parents=True, exist_ok=True)
+    keys = [_record_key(record) for record in records]
+    first, last = min(keys), max(keys)
+    name = f"bets-{first[0][:10].replace('-', '')}-{last[0][:10].replace('-', '')}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+    path = directory / name
+    tmp_path = path.with_suffix(".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, default=str))
+            f.write("\n")
+    tmp_path.rename(path)
+
+    index = _load_index(directory)
+    index.append({"file": name, "first": list(first), "last": list(last), "count": len(records)})
+    index_path = directory / "index.json"
+    tmp_index = index_path.with_suffix(".tmp")
+    tmp_index.write_text(json.dumps(index), encoding="utf-8")
+    tmp_index.rename(index_path)
+
+
+# Files are sharded per user, and each user directory keeps an index of the
+# (created_at, id) range every file covers, so a page only opens the files
+# that can contain it.
+def _write_archive_files(records: list):
+    by_user = {}
+    for record in records:
+        by_user.setdefault(record["bet"]["user_id"], []).append(record)
+    for user_id, user_records in by_user.items():
+        _write_file(_user_dir(user_id), user_records)
+
+
+def _read_archived_bets(user_id: int, before: list = None, limit: int = 100) -> list:
+    directory = _user_dir(user_id)
+    entries = _load_index(directory)
+    if before:
+        before = tuple(before)
+        entries = [entry for entry in entries if tuple(entry["first"]) < before]
+    entries.sort(key=lambda entry: tuple(entry["last"]), reverse=True)
+
+    bets = {}
+    for entry in entries:
+        if len(bets) >= limit:
+            # Files are visited newest-last first; once a file ends before the
+            # oldest record this page would keep, no remaining file can change it.
+            keys = heapq.nlargest(limit, (_record_key(record) for record in bets.values()))
+            if tuple(entry["last"]) < keys[-1]:
+                break
+        with gzip.open(directory / entry["file"], "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if before is None or _record_key(record) < before:
+                    bets[record["bet"]["id"]] = record
+    records = heapq.nlargest(limit, bets.values(), key=_record_key)
+    return [{**record["bet"], "transactions": record["transactions"]} for record in records]
+
+
+async def claim_lease(db: AsyncSession) -> bool:
+    now = datetime.now(timezone.utc)
+    locked_until = now + timedelta(seconds=ARCHIVE_LEASE_SECONDS)
+    lease = await update_returning(
+        db,
+        models.MaintenanceLease,
+        [
+            models.MaintenanceLease.name == ARCHIVE_LEASE_NAME,
+            or_(
+                models.MaintenanceLease.locked_until.is_(None),
+                models.MaintenanceLease.locked_until < now,
+                models.MaintenanceLease.owner == _lease_owner,
+            ),
+        ],
+        {"owner": _lease_owner, "locked_until": locked_until},
+    )
+    if lease is None and await db.get(models.MaintenanceLease, ARCHIVE_LEASE_NAME) is None:
+        db.add(
+            models.MaintenanceLease(
+                name=ARCHIVE_LEASE_NAME, owner=_lease_owner, locked_until=locked_until
+            )
+        )
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return False
+        return True
+    await db.commit()
+    return lease is not None
+
+
+async def release_lease(db: AsyncSession):
+    await db.execute(
+        update(models.MaintenanceLease)
+        .where(models.MaintenanceLease.name == ARCHIVE_LEASE_NAME)
+        .where(models.MaintenanceLease.owner == _lease_owner)
+        .values(locked_until=None)
+    )
+    await db.commit()
+
+
+async def archive_settled_bets(db: AsyncSession, older_than_days: int = None) -> int:
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    archived = 0
+    while True:
+        # Renewed every batch so a long backlog does not outlive the lease.
+        if not await claim_lease(db):
+            logger.warning("Lost the bet archive lease, stopping")
+            break
+        result = await db.execute(
+            select(models.Bet)
+            .filter(models.Bet.status.in_(SETTLED_STATUSES))
+            .filter(models.Bet.created_at < cutoff)
+            .order_by(models.Bet.created_at, models.Bet.id)
+            .limit(ARCHIVE_BATCH_SIZE)
+        )
+        bets = result.scalars().all()
+        if not bets:
+            break
+
+        bet_ids = [bet.id for bet in bets]
+        result = await db.execute(
+            select(models.Transaction).filter(
+                models.Transaction.related_bet_id.in_(bet_ids)
+            )
+        )
+        transactions = {}
+        for transaction in result.scalars().all():
+            transactions.setdefault(transaction.related_bet_id, []).append(
+                schemas.Transaction.model_validate(transaction).model_dump()
+            )
+        records = [
+            {
+                "bet": schemas.Bet.model_validate(bet).model_dump(),
+                "transactions": transactions.get(bet.id, []),
+            }
+            for bet in bets
+        ]
+        await asyncio.to_thread(_write_archive_files, records)
+
+        await db.execute(
+            delete(models.Transaction).where(
+                models.Transaction.related_bet_id.in_(bet_ids)
+            )
+        )
+        await db.execute(
+            delete(models.Bet)
+            .where(models.Bet.id.in_(bet_ids))
+            .where(models.Bet.created_at < cutoff)
+        )
+        await db.commit()
+        archived += len(bets)
+
+    if archived:
+        logger.info(f"Archived {archived} settled bets older than {cutoff}")
+    return archived
+
+
+async def get_archived_bets(user_id: int, before: list = None, limit: int = 100) -> list:
+    return await asyncio.to_thread(_read_archived_bets, user_id, before, limit)
+
+
+async def run_maintenance(session_factory, engine):
+    cutoff = datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    async with session_factory() as db:
+        # Every replica runs this loop; only the lease holder does the work.
+        if not await claim_lease(db):
+            return
+        try:
+            async with engine.begin() as conn:
+                await partitions.ensure_partitions(conn)
+            await archive_settled_bets(db)
+            await crud.purge_idempotency_keys(
+                db, older_than=datetime.utcnow() - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+            )
+            async with engine.begin() as conn:
+                dropped = await partitions.drop_empty_partitions(conn, before=cutoff)
+            if dropped:
+                logger.info(f"Dropped empty partitions: {', '.join(dropped)}")
+        finally:
+            await release_lease(db)
+
+
+async def maintenance_loop(session_factory, engine):
+    while True:
+        try:
+            await run_maintenance(session_factory, engine)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Bet archive maintenance failed: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
@@ -1,65 +1,273 @@
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, schemas
-import httpx
-import os
-from sqlalchemy import update 
+from .upstreams import user_service
+from common.writes import insert_returning, upsert_increment
+from sqlalchemy import update, tuple_, insert, delete, case, func, type_coerce, Numeric
+from datetime import datetime
+from decimal import Decimal
+import hashlib
+import json
 
-USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://user_service:80")
+STATS_COLUMNS = [
+    "bet_count",
+    "total_staked",
+    "pending_count",
+    "pending_staked",
+    "won_count",
+    "won_staked",
+    "total_payout",
+    "lost_count",
+    "lost_staked",
+    "net_pnl",
+]
+
+
+def stats_row(user_id: int, **values) -> dict:
+    return {"user_id": user_id, **{column: values.get(column, 0) for column in STATS_COLUMNS}}
+
+
+def request_fingerprint(bet: schemas.BetCreate) -> str:
+    body = json.dumps(bet.dict(), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+# Rows are locked in user_id order so concurrent batches and settlements
+# touching the same users cannot deadlock each other.
+async def update_user_stats(db: AsyncSession, rows: list):
+    rows = sorted(rows, key=lambda row: row["user_id"])
+    await upsert_increment(db, models.UserBetStats, "user_id", rows, STATS_COLUMNS)
 
 
 async def create_bet(
-    db: AsyncSession, bet: schemas.BetCreate, user_id: int, odds_on_bet: float
+    db: AsyncSession,
+    bet: schemas.BetCreate,
+    user_id: int,
+    odds_on_bet: float,
+    wallet_id: int,
+    idempotency_key: str = None,
 ):
-    db_bet = models.Bet(
-        **bet.dict(), user_id=user_id, odds_on_bet=odds_on_bet
+    db_bets = await create_bets(
+        db,
+        [
+            {
+                "bet": bet,
+                "user_id": user_id,
+                "odds_on_bet": odds_on_bet,
+                "wallet_id": wallet_id,
+                "idempotency_key": idempotency_key,
+            }
+        ],
+    )
+    return db_bets[0]
+
+
+async def create_bets(db: AsyncSession, items: list):
+    result = await db.execute(
+        insert(models.Bet).returning(models.Bet, sort_by_parameter_order=True),
+        [
+            {**item["bet"].dict(), "user_id": item["user_id"], "odds_on_bet": item["odds_on_bet"]}
+            for item in items
+        ],
+    )
+    db_bets = result.scalars().all()
+    await db.execute(
+        insert(models.Transaction),
+        [
+            {
+                "wallet_id": item["wallet_id"],
+                "amount": -item["bet"].amount_staked,
+                "type": "bet_placed",
+                "related_bet_id": db_bet.id,
+            }
+            for item, db_bet in zip(items, db_bets)
+        ],
+    )
+    keys = [
+        {
+            "user_id": item["user_id"],
+            "key": item["idempotency_key"],
+            "bet_id": db_bet.id,
+            "bet_created_at": db_bet.created_at,
+            "request_hash": request_fingerprint(item["bet"]),
+        }
+        for item, db_bet in zip(items, db_bets)
+        if item.get("idempotency_key")
+    ]
+    if keys:
+        await db.execute(insert(models.IdempotencyKey), keys)
+    stats = {}
+    for db_bet in db_bets:
+        row = stats.setdefault(db_bet.user_id, stats_row(db_bet.user_id))
+        row["bet_count"] += 1
+        row["total_staked"] += db_bet.amount_staked
+        row["pending_count"] += 1
+        row["pending_staked"] += db_bet.amount_staked
+    await update_user_stats(db, list(stats.values()))
+    await db.commit()
+    return db_bets
+
+
+async def get_bet_by_idempotency_key(db: AsyncSession, user_id: int, key: str):
+    result = await db.execute(
+        select(models.Bet, models.IdempotencyKey.request_hash)
+        .join(
+            models.IdempotencyKey,
+            (models.IdempotencyKey.bet_id == models.Bet.id)
+            & (models.IdempotencyKey.bet_created_at == models.Bet.created_at),
+        )
+        .filter(models.IdempotencyKey.user_id == user_id)
+        .filter(models.IdempotencyKey.key == key)
+    )
+    return result.first()
+
+
+async def purge_idempotency_keys(db: AsyncSession, older_than: datetime):
+    result = await db.execute(
+        delete(models.IdempotencyKey).where(models.IdempotencyKey.created_at < older_than)
     )
-    db.add(db_bet)
     await db.commit()
-    await db.refresh(db_bet)
-    return db_bet
+    return result.rowcount
+
+
+BET_COLUMNS = (
+    models.Bet.match_id,
+    models.Bet.outcome,
+    models.Bet.amount_staked,
+    models.Bet.id,
+    models.Bet.user_id,
+    models.Bet.odds_on_bet,
+    models.Bet.status,
+    models.Bet.created_at,
+    models.Bet.payout,
+)
 
 
-async def get_bets_by_user(db: AsyncSession, user_id: int):
-    result = await db.execute(select(models.Bet).filter(models.Bet.user_id == user_id))
-    return result.scalars().all()
+async def get_bets_by_user(
+    db: AsyncSession, user_id: int, before: list = None, limit: int = 100
+):
+    query = select(*BET_COLUMNS).filter(models.Bet.user_id == user_id)
+    if before:
+        created_at, bet_id = before
+        query = query.filter(
+            tuple_(models.Bet.created_at, models.Bet.id)
+            < tuple_(created_at, bet_id)
+        )
+    result = await db.execute(
+        query.order_by(models.Bet.created_at.desc(), models.Bet.id.desc()).limit(limit)
+    )
+    return result.all()
 
 
-async def get_bets_by_match(db: AsyncSession, match_id: int):
-    result = await db.execute(select(models.Bet).filter(models.Bet.match_id == match_id))
-    return result.scalars().all()
+async def get_bets_by_match(
+    db: AsyncSession,
+    match_id: int,
+    after_id: int = None,
+    limit: int = 100,
+    status: str = None,
+):
+    query = select(*BET_COLUMNS).filter(models.Bet.match_id == match_id)
+    if status is not None:
+        query = query.filter(models.Bet.status == status)
+    if after_id is not None:
+        query = query.filter(models.Bet.id > after_id)
+    result = await db.execute(query.order_by(models.Bet.id).limit(limit))
+    return result.all()
  
  
 async def verify_user_balance(user_id: int, amount: float, token: str):
-    async with httpx.AsyncClient() as client:
-        headers = {"Authorization": f"Bearer {token}"}
-        response = await client.get(f"{USER_SERVICE_URL}/users/me/wallet", headers=headers)
-        if response.status_code == 200:
-            wallet = response.json()
-            return wallet["balance"] >= amount
-        return False
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await user_service.get("/users/me/wallet", headers=headers)
+    if response.status_code == 200:
+        wallet = response.json()
+        return wallet["balance"] >= amount
+    return False
 
 
 async def create_transaction(db: AsyncSession, transaction: schemas.TransactionCreate):
-    db_transaction = models.Transaction(**transaction.dict())
-    db.add(db_transaction)
+    db_transaction = await insert_returning(db, models.Transaction, transaction.dict())
     await db.commit()
-    await db.refresh(db_transaction)
     return db_transaction
 
 async def settle_bets(db: AsyncSession, match_id: int, winning_outcome: str):
-    await db.execute(
-        update(models.Bet)
-        .where(models.Bet.match_id == match_id)
-        .where(models.Bet.outcome == winning_outcome)
-        .values(status="won")
+    pending = (models.Bet.match_id == match_id, models.Bet.status == "pending")
+    is_winner = models.Bet.outcome == winning_outcome
+    # Joined as UPDATE ... FROM so the totals are computed once, before any row
+    # changes; scalar subqueries in SET are re-run per row on SQLite. Typed as
+    # unbounded Numeric so the division does not cast them back to the
+    # column's NUMERIC(10, 2) and overflow on large matches.
+    totals = (
+        select(
+            models.Bet.match_id,
+            type_coerce(func.sum(models.Bet.amount_staked), Numeric()).label("pot"),
+            type_coerce(
+                func.sum(case((is_winner, models.Bet.amount_staked))), Numeric()
+            ).label("winning_stake"),
+        )
+        .where(*pending)
+        .group_by(models.Bet.match_id)
+        .subquery()
     )
-    
-    await db.execute(
+    stake = type_coerce(models.Bet.amount_staked, Numeric())
+    result = await db.execute(
         update(models.Bet)
-        .where(models.Bet.match_id == match_id)
-        .where(models.Bet.outcome != winning_outcome)
-        .values(status="lost")
+        .where(*pending, models.Bet.match_id == totals.c.match_id)
+        .values(
+            status=case((is_winner, "won"), else_="lost"),
+            payout=case(
+                (is_winner, func.round(stake * totals.c.pot / totals.c.winning_stake, 2)),
+                else_=0,
+            ),
+        )
+        .returning(
+            models.Bet.user_id,
+            models.Bet.outcome,
+            models.Bet.amount_staked,
+            models.Bet.payout,
+        )
+    )
+    settled = result.all()
+
+    stats = {}
+    for bet in settled:
+        payout = Decimal(str(bet.payout))
+        row = stats.setdefault(bet.user_id, stats_row(bet.user_id))
+        row["pending_count"] -= 1
+        row["pending_staked"] -= bet.amount_staked
+        row["net_pnl"] += payout - bet.amount_staked
+        if bet.outcome == winning_outcome:
+            row["won_count"] += 1
+            row["won_staked"] += bet.amount_staked
+            row["total_payout"] += payout
+        else:
+            row["lost_count"] += 1
+            row["lost_staked"] += bet.amount_staked
+    if stats:
+        await update_user_stats(db, list(stats.values()))
+    await db.commit()
+    return settled
+
+
+async def get_settlement_totals(db: AsyncSession, match_id: int):
+    is_winner = models.Bet.status == "won"
+    result = await db.execute(
+        select(
+            func.count().label("bets_total"),
+            func.coalesce(func.sum(case((is_winner, 1), else_=0)), 0).label("winners"),
+            func.coalesce(func.sum(models.Bet.amount_staked), 0).label("total_pot"),
+            func.coalesce(
+                func.sum(case((is_winner, models.Bet.amount_staked), else_=0)), 0
+            ).label("total_winning_stake"),
+            func.coalesce(func.sum(models.Bet.payout), 0).label("total_payout"),
+        )
+        .filter(models.Bet.match_id == match_id)
+        .filter(models.Bet.status.in_(("won", "lost")))
+    )
+    return result.one()
+
+
+async def get_user_stats(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models.UserBetStats).filter(models.UserBetStats.user_id == user_id)
     )
-    
-    await db.commit()
\ No newline at end of file
+    return result.scalars().first()
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from . import crud
+from .database import async_session
+from common.config import env_bool, env_int, env_float
+
+BET_GROUP_COMMIT = env_bool("BET_GROUP_COMMIT", False)
+BET_GROUP_COMMIT_MAX_BATCH = env_int("BET_GROUP_COMMIT_MAX_BATCH", 100)
+BET_GROUP_COMMIT_MAX_DELAY_MS = env_float("BET_GROUP_COMMIT_MAX_DELAY_MS", 5.0)
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    def __init__(self, session_factory, max_batch: int, max_delay: float):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.items = 0
+        self.fallbacks = 0
+        self._pending = []
+        self._timer = None
+        self._flushes = set()
+
+    async def submit(self, **item):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_now)
+        return await future
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._write(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch: list):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            async with self.session_factory() as db:
+                db_bets = await crud.create_bets(db, [item for item, _ in batch])
+        except Exception as e:
+            # One bad row (a duplicate idempotency key, say) fails the whole
+            # statement, so replay the batch one bet at a time and give each
+            # caller its own outcome.
+            logger.warning(f"Group commit of {len(batch)} bets failed, writing singly: {e}")
+            self.fallbacks += 1
+            await self._write_singly(batch)
+            return
+        for (_, future), db_bet in zip(batch, db_bets):
+            if not future.done():
+                future.set_result(db_bet)
+
+    async def _write_singly(self, batch: list):
+        for item, future in batch:
+            try:
+                async with self.session_factory() as db:
+                    db_bet = await crud.create_bet(db=db, **item)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(db_bet)
+
+    async def close(self):
+        self._flush_now()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_delay": self.max_delay,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "fallbacks": self.fallbacks,
+        }
+
+
+bet_writer = GroupCommitWriter(
+    async_session, BET_GROUP_COMMIT_MAX_BATCH, BET_GROUP_COMMIT_MAX_DELAY_MS / 1000
+)
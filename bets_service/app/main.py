@@ -1,33 +1,54 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from . import crud, models, schemas, auth
-from .database import get_db, engine
-import httpx
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
+from datetime import datetime
+from . import crud, models, schemas, admission, archive, ingest, partitions
+from .database import get_db, engine, async_session
+from common import auth, database, metrics, pagination, serialization, tracing
+from .upstreams import upstreams, user_service, matches_service, match_lookups
+import asyncio
 import os
 
 import logging
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format=tracing.LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 ROOT_PATH = os.getenv("ROOT_PATH", "")
 app = FastAPI(root_path=ROOT_PATH)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware, service_name="bets_service")
 
 @app.on_event("startup")
 async def startup():
     logger.info(f"FastAPI app starting with ROOT_PATH: {ROOT_PATH}")
 router = APIRouter()
 
-MATCHES_SERVICE_URL = os.getenv("MATCHES_SERVICE_URL", "http://matches_service:80")
-USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://user_service:80")
-
 
 @app.on_event("startup")
 async def startup():
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+        await partitions.ensure_partitions(conn)
+    await upstreams.start()
+    await tracing.processor.start()
+    if archive.ARCHIVE_INTERVAL_SECONDS > 0:
+        app.state.archive_task = asyncio.create_task(
+            archive.maintenance_loop(async_session, engine)
+        )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    archive_task = getattr(app.state, "archive_task", None)
+    if archive_task:
+        archive_task.cancel()
+    await ingest.bet_writer.close()
+    await upstreams.close()
+    await tracing.processor.shutdown()
 
 
 def is_admin(user: auth.User = Depends(auth.get_current_user)):
@@ -36,88 +57,225 @@ def is_admin(user: auth.User = Depends(auth.get_current_user)):
             status_code=403, detail="The user doesn't have enough privileges"
         )
     return user
+
+
+@app.exception_handler(admission.AdmissionRejected)
+async def admission_rejected_handler(request, exc):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
  
  
-@router.post("/bets/", response_model=schemas.Bet)
+def replay_bet(existing, bet: schemas.BetCreate, response: Response):
+    db_bet, request_hash = existing
+    if request_hash != crud.request_fingerprint(bet):
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different bet",
+        )
+    response.headers["Idempotent-Replayed"] = "true"
+    return db_bet
+
+
+async def refund_stake(headers: dict, amount: float):
+    try:
+        response = await user_service.patch(
+            "/users/me/wallet", json={"amount": amount}, headers=headers
+        )
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"Failed to refund stake of {amount}: {e}")
+
+
+@router.post(
+    "/bets/", response_model=schemas.Bet, dependencies=[Depends(admission.admit_bet)]
+)
 async def create_bet(
     bet: schemas.BetCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     db: AsyncSession = Depends(get_db),
     current_user: auth.User = Depends(auth.get_current_user),
 ):
-    async with httpx.AsyncClient() as client:
-        headers = {"Authorization": f"Bearer {current_user.token}"}
-        response = await client.get(
-            f"{USER_SERVICE_URL}/users/me/wallet", headers=headers
+    if idempotency_key:
+        existing = await crud.get_bet_by_idempotency_key(
+            db, user_id=current_user.id, key=idempotency_key
         )
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Could not retrieve wallet")
-        wallet = response.json()
-        if wallet["balance"] < bet.amount_staked:
-            raise HTTPException(status_code=400, detail="Insufficient funds")
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{MATCHES_SERVICE_URL}/matches/{bet.match_id}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail="Match not found")
-        match = response.json()
-        odds_on_bet = match["odds"][bet.outcome]
-
-    db_bet = await crud.create_bet(
-        db=db, bet=bet, user_id=current_user.id, odds_on_bet=odds_on_bet
+        if existing is not None:
+            return replay_bet(existing, bet, response)
+
+    match_response = await match_lookups.do(
+        bet.match_id, lambda: matches_service.get(f"/matches/{bet.match_id}")
     )
+    if match_response.status_code != 200:
+        raise HTTPException(status_code=404, detail="Match not found")
+    match = match_response.json()
+    odds_on_bet = match["odds"][bet.outcome]
 
-    async with httpx.AsyncClient() as client:
-        headers = {"Authorization": f"Bearer {current_user.token}"}
-        response = await client.patch(
-            f"{USER_SERVICE_URL}/users/me/wallet",
-            json={"amount": -bet.amount_staked},
-            headers=headers,
-        )
-        if response.status_code != 200:
-            await db.delete(db_bet)
-            await db.commit()
-            raise HTTPException(
-                status_code=500, detail="Failed to update wallet balance"
-            )
-
-    transaction = schemas.TransactionCreate(
-        wallet_id=wallet["id"],
-        amount=-bet.amount_staked,
-        type="bet_placed",
-        related_bet_id=db_bet.id,
+    headers = {"Authorization": f"Bearer {current_user.token}"}
+    debit_response = await user_service.post(
+        "/users/me/wallet/debit",
+        json={"amount": bet.amount_staked},
+        headers=headers,
     )
-    await crud.create_transaction(db=db, transaction=transaction)
+    if debit_response.status_code == 409:
+        raise HTTPException(status_code=400, detail="Insufficient funds")
+    if debit_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Could not debit wallet")
+    wallet = debit_response.json()
+
+    item = {
+        "bet": bet,
+        "user_id": current_user.id,
+        "odds_on_bet": odds_on_bet,
+        "wallet_id": wallet["id"],
+        "idempotency_key": idempotency_key,
+    }
+    try:
+        if ingest.BET_GROUP_COMMIT:
+            db_bet = await ingest.bet_writer.submit(**item)
+        else:
+            db_bet = await crud.create_bet(db=db, **item)
+    except IntegrityError:
+        await db.rollback()
+        await refund_stake(headers, bet.amount_staked)
+        existing = await crud.get_bet_by_idempotency_key(
+            db, user_id=current_user.id, key=idempotency_key
+        )
+        if existing is None:
+            raise
+        db_bet = replay_bet(existing, bet, response)
+    except Exception:
+        await refund_stake(headers, bet.amount_staked)
+        raise
 
     return db_bet
 
 
 @router.get("/bets/", response_model=List[schemas.Bet])
 async def read_bets(
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.User = Depends(auth.get_current_user),
+):
+    before = pagination.decode_cursor(cursor, (datetime, int)) if cursor else None
+    bets = await crud.get_bets_by_user(
+        db=db, user_id=current_user.id, before=before, limit=limit
+    )
+    return serialization.json_response(
+        serialization.rows_to_json(bets),
+        pagination.next_cursor(bets, limit, lambda b: (b.created_at, b.id)),
+    )
+
+
+@router.get("/bets/stats", response_model=schemas.UserBetStats)
+async def read_bet_stats(
     db: AsyncSession = Depends(get_db),
     current_user: auth.User = Depends(auth.get_current_user),
 ):
-    return await crud.get_bets_by_user(db=db, user_id=current_user.id)
+    stats = await crud.get_user_stats(db, user_id=current_user.id)
+    return stats or schemas.UserBetStats(user_id=current_user.id)
+
+
+@router.get("/bets/archive", response_model=List[schemas.ArchivedBet])
+async def read_archived_bets(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: auth.User = Depends(auth.get_current_user),
+):
+    before = pagination.decode_cursor(cursor, (str, int)) if cursor else None
+    bets = await archive.get_archived_bets(
+        user_id=current_user.id, before=before, limit=limit
+    )
+    pagination.set_next_cursor(
+        response,
+        pagination.next_cursor(bets, limit, lambda b: (b["created_at"], b["id"])),
+    )
+    return bets
+
+
+@router.post("/bets/archive/run", dependencies=[Depends(is_admin)])
+async def run_bet_archive(
+    older_than_days: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    if not await archive.claim_lease(db):
+        raise HTTPException(status_code=409, detail="Bet archive is already running")
+    try:
+        archived = await archive.archive_settled_bets(db, older_than_days=older_than_days)
+    finally:
+        await archive.release_lease(db)
+    return {"archived": archived}
 
 
 @router.get("/matches/{match_id}/bets/", response_model=List[schemas.Bet], dependencies=[Depends(is_admin)])
 async def read_bets_for_match(
     match_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    status: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    return await crud.get_bets_by_match(db=db, match_id=match_id)
+    after_id = pagination.decode_cursor(cursor, (int,))[0] if cursor else None
+    bets = await crud.get_bets_by_match(
+        db=db, match_id=match_id, after_id=after_id, limit=limit, status=status
+    )
+    return serialization.json_response(
+        serialization.rows_to_json(bets),
+        pagination.next_cursor(bets, limit, lambda b: (b.id,)),
+    )
  
-@router.post("/matches/{match_id}/settle", dependencies=[Depends(is_admin)])
+@router.post(
+    "/matches/{match_id}/settle",
+    response_model=schemas.Settlement,
+    dependencies=[Depends(is_admin)],
+)
 async def settle_bets_for_match(
     match_id: int,
     outcome_data: schemas.MatchOutcome,
     db: AsyncSession = Depends(get_db),
 ):
-    await crud.settle_bets(db, match_id, outcome_data.winning_outcome)
-    return {"status": "bets settled"}
+    settled = await crud.settle_bets(db, match_id, outcome_data.winning_outcome)
+    totals = await crud.get_settlement_totals(db, match_id)
+    return schemas.Settlement(settled=len(settled), **totals._mapping)
 
 @app.get("/")
 async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return metrics.metrics_response(engine=engine, upstreams=upstreams)
+
+
+@app.get("/internal/auth-cache")
+async def auth_cache_stats():
+    return auth.token_cache.stats()
+
+
+@app.get("/internal/db-pool")
+async def db_pool_stats():
+    return database.pool_stats(engine)
+
+
+@app.get("/internal/upstreams")
+async def upstream_stats():
+    return {**upstreams.stats(), "match_lookups": match_lookups.stats()}
+
+
+@app.get("/internal/admission")
+async def admission_stats():
+    return admission.stats()
+
+
+@app.get("/internal/group-commit")
+async def group_commit_stats():
+    return {"enabled": ingest.BET_GROUP_COMMIT, **ingest.bet_writer.stats()}
+
+
 app.include_router(router)
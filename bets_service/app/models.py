@@ -4,8 +4,9 @@ from sqlalchemy import (
     String,
     DateTime,
     Numeric,
-    ForeignKey,
+    Index,
     func,
+    text,
 )
 from sqlalchemy.orm import declarative_base
 
@@ -14,23 +15,78 @@ Base = declarative_base()
 
 class Bet(Base):
     __tablename__ = "bets"
+    __table_args__ = (
+        Index("ix_bets_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_bets_match_id_id", "match_id", "id"),
+        Index(
+            "ix_bets_match_id_outcome_pending",
+            "match_id",
+            "outcome",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, nullable=False, index=True)
-    match_id = Column(Integer, nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    match_id = Column(Integer, nullable=False)
     outcome = Column(String, nullable=False)
     amount_staked = Column(Numeric(10, 2), nullable=False)
     odds_on_bet = Column(Numeric(5, 2), nullable=False)
     status = Column(String, nullable=False, default="pending")
-    created_at = Column(DateTime, server_default=func.now())
+    payout = Column(Numeric(12, 2), nullable=True)
+    created_at = Column(
+        DateTime, primary_key=True, nullable=False, server_default=func.now()
+    )
 
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     wallet_id = Column(Integer, nullable=False, index=True)
     amount = Column(Numeric(10, 2), nullable=False)
     type = Column(String, nullable=False)
-    related_bet_id = Column(Integer, ForeignKey("bets.id"), nullable=True)
-    created_at = Column(DateTime, server_default=func.now())
+    related_bet_id = Column(Integer, nullable=True, index=True)
+    created_at = Column(
+        DateTime, primary_key=True, nullable=False, server_default=func.now()
+    )
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "bet_idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    bet_id = Column(Integer, nullable=False)
+    bet_created_at = Column(DateTime, nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now(), index=True)
+
+
+class UserBetStats(Base):
+    __tablename__ = "user_bet_stats"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    bet_count = Column(Integer, nullable=False, default=0)
+    total_staked = Column(Numeric(14, 2), nullable=False, default=0)
+    pending_count = Column(Integer, nullable=False, default=0)
+    pending_staked = Column(Numeric(14, 2), nullable=False, default=0)
+    won_count = Column(Integer, nullable=False, default=0)
+    won_staked = Column(Numeric(14, 2), nullable=False, default=0)
+    total_payout = Column(Numeric(14, 2), nullable=False, default=0)
+    lost_count = Column(Integer, nullable=False, default=0)
+    lost_staked = Column(Numeric(14, 2), nullable=False, default=0)
+    net_pnl = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class MaintenanceLease(Base):
+    __tablename__ = "maintenance_leases"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
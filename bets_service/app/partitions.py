@@ -0,0 +1,84 @@
+from sqlalchemy import text
+from datetime import date, datetime
+import re
+import logging
+from common.config import env_int
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("bets", "transactions")
+PARTITION_MONTHS_AHEAD = env_int("PARTITION_MONTHS_AHEAD", 3)
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_(?P<year>\d{4})_(?P<month>\d{2})$")
+
+
+def _month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+async def _is_partitioned(conn, table: str) -> bool:
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+        ),
+        {"table": table},
+    )
+    return result.first() is not None
+
+
+async def ensure_partitions(conn, today: date = None):
+    if conn.dialect.name != "postgresql":
+        return
+    first_month = _add_months(_month_start(today or date.today()), -1)
+    for table in PARTITIONED_TABLES:
+        if not await _is_partitioned(conn, table):
+            logger.warning(f"Table {table} is not partitioned, skipping partition maintenance")
+            continue
+        await conn.execute(
+            text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+        )
+        for offset in range(PARTITION_MONTHS_AHEAD + 2):
+            start = _add_months(first_month, offset)
+            end = _add_months(start, 1)
+            await conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {table}_{start:%Y_%m} "
+                    f"PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')"
+                )
+            )
+
+
+async def drop_empty_partitions(conn, before: datetime):
+    if conn.dialect.name != "postgresql":
+        return []
+    dropped = []
+    for table in PARTITIONED_TABLES:
+        result = await conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :table"
+            ),
+            {"table": table},
+        )
+        for (name,) in result.all():
+            match = _PARTITION_NAME.match(name)
+            if not match or match.group("table") != table:
+                continue
+            start = date(int(match.group("year")), int(match.group("month")), 1)
+            if _add_months(start, 1) > before.date():
+                continue
+            has_rows = await conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})"))
+            if has_rows.scalar():
+                continue
+            await conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
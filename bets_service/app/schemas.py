@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class BetBase(BaseModel):
@@ -19,6 +19,24 @@ class Bet(BetBase):
     odds_on_bet: float
     status: str
     created_at: datetime
+    payout: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
+class UserBetStats(BaseModel):
+    user_id: int
+    bet_count: int = 0
+    total_staked: float = 0
+    pending_count: int = 0
+    pending_staked: float = 0
+    won_count: int = 0
+    won_staked: float = 0
+    total_payout: float = 0
+    lost_count: int = 0
+    lost_staked: float = 0
+    net_pnl: float = 0
 
     class Config:
         from_attributes = True
@@ -27,6 +45,15 @@ class Bet(BetBase):
 class MatchOutcome(BaseModel):
     winning_outcome: str 
 
+
+class Settlement(BaseModel):
+    settled: int
+    winners: int
+    bets_total: int
+    total_pot: float
+    total_winning_stake: float
+    total_payout: float
+
 class TransactionBase(BaseModel):
     wallet_id: int
     amount: float
@@ -44,3 +71,7 @@ class Transaction(TransactionBase):
 
     class Config:
         from_attributes = True
+
+
+class ArchivedBet(Bet):
+    transactions: List[Transaction] = []
@@ -0,0 +1,9 @@
+from common.http_client import Upstream, UpstreamRegistry
+from common.singleflight import SingleFlight
+
+user_service = Upstream.from_env("user_service", "http://user_service:80")
+matches_service = Upstream.from_env("matches_service", "http://matches_service:80")
+
+upstreams = UpstreamRegistry(user_service, matches_service)
+
+match_lookups = SingleFlight()
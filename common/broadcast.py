@@ -0,0 +1,56 @@
+import asyncio
+from typing import Hashable, Optional
+
+
+class Subscription:
+    def __init__(self, topic: Optional[Hashable], maxsize: int):
+        self.topic = topic
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    async def get(self) -> Optional[dict]:
+        return await self.queue.get()
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._subscribers = set()
+
+    def subscribe(self, topic: Optional[Hashable] = None) -> Subscription:
+        subscription = Subscription(topic, self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, topic: Hashable, event: dict):
+        self.published += 1
+        for subscription in list(self._subscribers):
+            if subscription.topic is not None and subscription.topic != topic:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription):
+        # A consumer that cannot keep up loses its backlog and gets a None
+        # sentinel so its stream ends instead of holding memory indefinitely.
+        self.unsubscribe(subscription)
+        subscription.dropped = True
+        self.dropped += 1
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,88 @@
+import time
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from . import metrics
+from .config import env_bool, env_int, env_float
+
+
+class PoolWaitStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6)
+            if self.checkouts
+            else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+def create_engine(database_url: str) -> AsyncEngine:
+    kwargs = {
+        "echo": env_bool("DB_ECHO", False),
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", False),
+        "pool_recycle": env_int("DB_POOL_RECYCLE", 1800),
+    }
+    if ":memory:" not in database_url:
+        kwargs.update(
+            poolclass=InstrumentedPool,
+            pool_size=env_int("DB_POOL_SIZE", 10),
+            max_overflow=env_int("DB_MAX_OVERFLOW", 10),
+            pool_timeout=env_float("DB_POOL_TIMEOUT", 10.0),
+        )
+    if database_url.startswith("postgresql+asyncpg"):
+        kwargs["connect_args"] = {
+            "statement_cache_size": env_int("DB_STATEMENT_CACHE_SIZE", 100),
+            "prepared_statement_cache_size": env_int(
+                "DB_PREPARED_STATEMENT_CACHE_SIZE", 100
+            ),
+        }
+    engine = create_async_engine(database_url, **kwargs)
+    metrics.instrument_engine(engine)
+    return engine
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.sync_engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout=pool.timeout(),
+        )
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        stats["wait"] = wait_stats.as_dict()
+    return stats
@@ -0,0 +1,147 @@
+import httpx
+import time
+from typing import Optional
+from . import metrics, tracing
+from .config import env_str, env_int, env_float
+
+
+class Upstream:
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 5.0,
+        connect_timeout: float = 2.0,
+        pool_timeout: float = 2.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.pool_timeout = pool_timeout
+        self.transport = transport
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def from_env(cls, name: str, default_url: str):
+        prefix = name.upper()
+        return cls(
+            name,
+            env_str(f"{prefix}_URL", default_url),
+            max_connections=env_int(f"{prefix}_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=env_int(f"{prefix}_MAX_KEEPALIVE", 20),
+            keepalive_expiry=env_float(f"{prefix}_KEEPALIVE_EXPIRY", 30.0),
+            timeout=env_float(f"{prefix}_TIMEOUT", 5.0),
+            connect_timeout=env_float(f"{prefix}_CONNECT_TIMEOUT", 2.0),
+            pool_timeout=env_float(f"{prefix}_POOL_TIMEOUT", 2.0),
+        )
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(
+                    self.timeout, connect=self.connect_timeout, pool=self.pool_timeout
+                ),
+                transport=self.transport,
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError(f"Upstream {self.name} is not started")
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        self.requests_total += 1
+        self.in_flight += 1
+        status = "error"
+        start = time.perf_counter()
+        with tracing.start_span(
+            f"{method} {self.name}",
+            tracing.SPAN_KIND_CLIENT,
+            attributes={"http.method": method, "http.url": f"{self.base_url}{url}"},
+        ) as span:
+            kwargs["headers"] = tracing.inject(kwargs.get("headers"))
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                status = response.status_code
+                span.set_attribute("http.status_code", status)
+                return response
+            except httpx.HTTPError:
+                self.errors_total += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                metrics.observe_upstream(
+                    self.name, method, status, time.perf_counter() - start
+                )
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+
+    def stats(self) -> dict:
+        transport = getattr(self._client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        connections = list(getattr(pool, "connections", None) or [])
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "base_url": self.base_url,
+            "started": self._client is not None,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "connections": len(connections),
+            "connections_active": len(connections) - idle,
+            "connections_idle": idle,
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+        }
+
+
+class UpstreamRegistry:
+    def __init__(self, *upstreams: Upstream):
+        self._upstreams = {upstream.name: upstream for upstream in upstreams}
+
+    def __getitem__(self, name: str) -> Upstream:
+        return self._upstreams[name]
+
+    def __iter__(self):
+        return iter(self._upstreams.values())
+
+    async def start(self):
+        for upstream in self._upstreams.values():
+            await upstream.start()
+
+    async def close(self):
+        for upstream in self._upstreams.values():
+            await upstream.close()
+
+    def stats(self) -> dict:
+        return {name: upstream.stats() for name, upstream in self._upstreams.items()}
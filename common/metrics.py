@@ -0,0 +1,279 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+def family(
+    name: str, documentation: str, kind: str, samples: list, labelnames: tuple = ()
+) -> list:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+    return lines
+
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route")
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries",
+    "Database queries issued while serving one request.",
+    ("method", "route"),
+    QUERY_COUNT_BUCKETS,
+)
+http_request_db_duration = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries while serving one request.",
+    ("method", "route"),
+)
+http_request_upstream_duration = Histogram(
+    "http_request_upstream_duration_seconds",
+    "Time spent waiting on an upstream service while serving one request.",
+    ("method", "route", "upstream"),
+)
+db_queries = Counter("db_queries_total", "Database queries executed.")
+db_query_duration = Histogram("db_query_duration_seconds", "Database query latency.")
+upstream_requests = Counter(
+    "upstream_requests_total",
+    "Outbound requests to other services.",
+    ("upstream", "method", "status"),
+)
+upstream_request_duration = Histogram(
+    "upstream_request_duration_seconds",
+    "Outbound request latency to other services.",
+    ("upstream", "method"),
+)
+
+METRICS = (
+    http_requests,
+    http_request_duration,
+    http_request_db_queries,
+    http_request_db_duration,
+    http_request_upstream_duration,
+    db_queries,
+    db_query_duration,
+    upstream_requests,
+    upstream_request_duration,
+)
+
+
+class RequestStats:
+    __slots__ = ("db_queries", "db_seconds", "upstream_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.upstream_seconds = {}
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def observe_query(seconds: float):
+    db_queries.inc()
+    db_query_duration.observe((), seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += seconds
+
+
+def observe_upstream(upstream: str, method: str, status, seconds: float):
+    upstream_requests.inc((upstream, method, str(status)))
+    upstream_request_duration.observe((upstream, method), seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.upstream_seconds[upstream] = stats.upstream_seconds.get(upstream, 0.0) + seconds
+
+
+def instrument_engine(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        observe_query(time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start"):
+            observe_query(time.perf_counter() - connection.info["query_start"].pop())
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            labels = (scope["method"], route)
+            http_requests.inc((*labels, str(status)))
+            http_request_duration.observe(labels, time.perf_counter() - start)
+            http_request_db_queries.observe(labels, stats.db_queries)
+            http_request_db_duration.observe(labels, stats.db_seconds)
+            for upstream, seconds in stats.upstream_seconds.items():
+                http_request_upstream_duration.observe((*labels, upstream), seconds)
+
+
+def _pool_gauges(engine: AsyncEngine) -> list:
+    pool = engine.sync_engine.pool
+    lines = []
+    if hasattr(pool, "checkedout"):
+        lines += family(
+            "db_pool_connections",
+            "Database pool connections by state.",
+            "gauge",
+            [(("checked_out",), pool.checkedout()), (("checked_in",), pool.checkedin())],
+            ("state",),
+        )
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        lines += family(
+            "db_pool_wait_seconds_total",
+            "Time spent waiting to check out a database connection.",
+            "counter",
+            [((), wait_stats.wait_seconds_total)],
+        )
+        lines += family(
+            "db_pool_timeouts_total",
+            "Database connection checkouts that timed out.",
+            "counter",
+            [((), wait_stats.timeouts)],
+        )
+    return lines
+
+
+def _upstream_gauges(upstreams) -> list:
+    return family(
+        "upstream_in_flight",
+        "Outbound requests currently waiting on a response.",
+        "gauge",
+        [((upstream.name,), upstream.in_flight) for upstream in upstreams],
+        ("upstream",),
+    )
+
+
+def render(engine: AsyncEngine = None, upstreams=None) -> str:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    if engine is not None:
+        lines += _pool_gauges(engine)
+    if upstreams is not None:
+        lines += _upstream_gauges(upstreams)
+    return "\n".join(lines) + "\n"
+
+
+def metrics_response(engine: AsyncEngine = None, upstreams=None) -> Response:
+    return Response(content=render(engine, upstreams), media_type=CONTENT_TYPE)
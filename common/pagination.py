@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Optional
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_value(value, kind):
+    if kind is datetime:
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    elif type(value) is kind:
+        return value
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def decode_cursor(cursor: str, types: tuple) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [_decode_value(value, kind) for value, kind in zip(values, types)]
+
+
+def next_cursor(items: list, limit: int, key: Callable) -> Optional[str]:
+    if len(items) < limit:
+        return None
+    return encode_cursor(*key(items[-1]))
+
+
+def set_next_cursor(response: Response, cursor: Optional[str]):
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
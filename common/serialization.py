@@ -0,0 +1,25 @@
+from decimal import Decimal
+from typing import Iterable, Optional
+import orjson
+from fastapi import Response
+
+from .pagination import NEXT_CURSOR_HEADER
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+def rows_to_json(rows: Iterable) -> bytes:
+    return dumps([row._asdict() for row in rows])
+
+
+def json_response(body: bytes, next_cursor: Optional[str] = None) -> Response:
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,376 @@
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import httpx
+from .config import env_str, env_int, env_float
+
+TRACE_EXPORTER = env_str("TRACE_EXPORTER", "none")
+TRACE_FILE = env_str("TRACE_FILE", "spans.ndjson")
+TRACE_OTLP_ENDPOINT = env_str("TRACE_OTLP_ENDPOINT", "http://localhost:4318")
+TRACE_SAMPLE_RATIO = env_float("TRACE_SAMPLE_RATIO", 1.0)
+TRACE_QUEUE_SIZE = env_int("TRACE_QUEUE_SIZE", 4096)
+TRACE_BATCH_SIZE = env_int("TRACE_BATCH_SIZE", 512)
+TRACE_EXPORT_INTERVAL = env_float("TRACE_EXPORT_INTERVAL", 1.0)
+
+LOG_FORMAT = "%(levelname)s:%(name)s:trace=%(trace_id)s span=%(span_id)s:%(message)s"
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+logger = logging.getLogger(__name__)
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "kind",
+        "service",
+        "context",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, name: str, kind: int, service: str, context: SpanContext, parent_id):
+        self.name = name
+        self.kind = kind
+        self.service = service
+        self.context = context
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.context.sampled:
+                processor.enqueue(self)
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": self.service,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _begin(name: str, kind: int, service: str = None, parent: SpanContext = None) -> Span:
+    current = _current_span.get()
+    if parent is None and current is not None:
+        parent = current.context
+    if service is None and current is not None:
+        service = current.service
+    if parent is None:
+        context = SpanContext(_new_id(128), _new_id(64), random.random() < TRACE_SAMPLE_RATIO)
+        parent_id = None
+    else:
+        context = SpanContext(parent.trace_id, _new_id(64), parent.sampled)
+        parent_id = parent.span_id
+    return Span(name, kind, service or "unknown", context, parent_id)
+
+
+@contextmanager
+def start_span(
+    name: str,
+    kind: int = SPAN_KIND_INTERNAL,
+    service: str = None,
+    parent: SpanContext = None,
+    attributes: dict = None,
+):
+    span = _begin(name, kind, service, parent)
+    if attributes:
+        span.attributes.update(attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def inject(headers) -> dict:
+    headers = dict(headers or {})
+    span = _current_span.get()
+    if span is not None:
+        headers["traceparent"] = span.context.traceparent
+    return headers
+
+
+class TracingMiddleware:
+    def __init__(self, app, service_name: str):
+        self.app = app
+        self.service_name = service_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with start_span(
+            f"{scope['method']} {scope['path']}",
+            SPAN_KIND_SERVER,
+            service=self.service_name,
+            parent=parse_traceparent(traceparent),
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        ) as span:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.error = f"HTTP {message['status']}"
+                    message.setdefault("headers", [])
+                    message["headers"] = [
+                        *message["headers"],
+                        (b"traceparent", span.context.traceparent.encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.name = f"{scope['method']} {route}"
+                    span.set_attribute("http.route", route)
+
+
+class FileExporter:
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, spans: list):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.as_dict()) + "\n")
+
+    async def export(self, spans: list):
+        await asyncio.to_thread(self._write, spans)
+
+    async def shutdown(self):
+        pass
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_payload(spans: list) -> dict:
+    by_service = {}
+    for span in spans:
+        by_service.setdefault(span.service, []).append(span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": service})},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [
+                            {
+                                "traceId": span.context.trace_id,
+                                "spanId": span.context.span_id,
+                                **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                                "name": span.name,
+                                "kind": span.kind,
+                                "startTimeUnixNano": str(span.start_ns),
+                                "endTimeUnixNano": str(span.end_ns),
+                                "attributes": _otlp_attributes(span.attributes),
+                                "status": {"code": 2, "message": span.error}
+                                if span.error
+                                else {"code": 1},
+                            }
+                            for span in service_spans
+                        ],
+                    }
+                ],
+            }
+            for service, service_spans in by_service.items()
+        ]
+    }
+
+
+class OTLPHttpExporter:
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def export(self, spans: list):
+        response = await self._client.post(self.url, json=otlp_payload(spans))
+        response.raise_for_status()
+
+    async def shutdown(self):
+        await self._client.aclose()
+
+
+def create_exporter(name: str):
+    if name == "file":
+        return FileExporter(TRACE_FILE)
+    if name == "otlp":
+        return OTLPHttpExporter(TRACE_OTLP_ENDPOINT)
+    if name in ("", "none"):
+        return None
+    raise ValueError(f"Unknown TRACE_EXPORTER: {name}")
+
+
+class BatchProcessor:
+    def __init__(self, exporter, queue_size: int, batch_size: int, interval: float):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self.exported = 0
+        self.failed = 0
+        self._queue = deque()
+        self._queue_size = queue_size
+        self._task = None
+        self._users = 0
+
+    def enqueue(self, span: Span):
+        if self.exporter is None:
+            return
+        if len(self._queue) >= self._queue_size:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+
+    async def flush(self):
+        while self._queue:
+            batch = [
+                self._queue.popleft()
+                for _ in range(min(self.batch_size, len(self._queue)))
+            ]
+            try:
+                await self.exporter.export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"Exporting {len(batch)} spans failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def start(self):
+        self._users += 1
+        if self.exporter is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        self._users -= 1
+        if self._users > 0 or self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        await self.flush()
+        await self.exporter.shutdown()
+
+    def stats(self) -> dict:
+        return {
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "queued": len(self._queue),
+            "exported": self.exported,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+processor = BatchProcessor(
+    create_exporter(TRACE_EXPORTER),
+    TRACE_QUEUE_SIZE,
+    TRACE_BATCH_SIZE,
+    TRACE_EXPORT_INTERVAL,
+)
+
+_record_factory = logging.getLogRecordFactory()
+
+
+def _record_with_trace(*args, **kwargs):
+    record = _record_factory(*args, **kwargs)
+    span = _current_span.get()
+    record.trace_id = span.context.trace_id if span else "-"
+    record.span_id = span.context.span_id if span else "-"
+    return record
+
+
+logging.setLogRecordFactory(_record_with_trace)
@@ -0,0 +1,64 @@
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+UPSERT_CHUNK_SIZE = 1000
+
+
+async def insert_returning(db: AsyncSession, model, values: dict):
+    result = await db.execute(insert(model).values(**values).returning(model))
+    return result.scalar_one()
+
+
+async def update_returning(db: AsyncSession, model, where: list, values: dict):
+    result = await db.execute(
+        update(model).where(*where).values(**values).returning(model)
+    )
+    return result.scalars().first()
+
+
+async def _update_increment(db: AsyncSession, table, key: str, row: dict, columns: list) -> bool:
+    result = await db.execute(
+        update(table)
+        .where(table.c[key] == row[key])
+        .values({column: table.c[column] + row[column] for column in columns})
+    )
+    return result.rowcount > 0
+
+
+# Dialects without ON CONFLICT: update first and insert only when no row
+# matched. A concurrent insert of the same key loses the race inside a
+# savepoint and is retried as an update, all in the caller's transaction.
+async def _upsert_increment_generic(db: AsyncSession, table, key: str, rows: list, columns: list):
+    for row in rows:
+        if await _update_increment(db, table, key, row, columns):
+            continue
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(table).values(row))
+        except IntegrityError:
+            await _update_increment(db, table, key, row, columns)
+
+
+async def upsert_increment(db: AsyncSession, model, key: str, rows: list, columns: list):
+    dialect = db.bind.dialect.name
+    table = model.__table__
+    if dialect == "postgresql":
+        dialect_insert = postgresql.insert
+    elif dialect == "sqlite":
+        dialect_insert = sqlite.insert
+    else:
+        await _upsert_increment_generic(db, table, key, rows, columns)
+        return
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        statement = dialect_insert(table).values(rows[start : start + UPSERT_CHUNK_SIZE])
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[table.c[key]],
+                set_={
+                    column: table.c[column] + statement.excluded[column]
+                    for column in columns
+                },
+            )
+        )
@@ -32,7 +32,9 @@ import OddsForm from './OddsForm';
 export default function AdminMatchesPage() {
   const [matches, setMatches] = useState<Match[]>([]);
   const [teams, setTeams] = useState<Team[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState<boolean>(true);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
   const [isMatchDialogOpen, setMatchDialogOpen] = useState(false);
   const [isOddsDialogOpen, setOddsDialogOpen] = useState(false);
   const [selectedMatch, setSelectedMatch] = useState<Match | undefined>(undefined);
@@ -40,8 +42,9 @@ export default function AdminMatchesPage() {
 
   const fetchMatchesAndTeams = async () => {
     try {
-      const [matchesRes, teamsRes] = await Promise.all([apiClient.matches.getAll(), apiClient.teams.getAll()]);
-      setMatches(matchesRes.data);
+      const [matchesPage, teamsRes] = await Promise.all([apiClient.matches.getPage(), apiClient.teams.getAll()]);
+      setMatches(matchesPage.items);
+      setNextCursor(matchesPage.nextCursor);
       setTeams(teamsRes.data);
     } catch (error) {
       console.error('Ошибка при загрузке матчей или команд:', error);
@@ -54,6 +57,19 @@ export default function AdminMatchesPage() {
     fetchMatchesAndTeams();
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await apiClient.matches.getPage(nextCursor);
+      setMatches((prev) => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Ошибка при загрузке матчей:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSuccess = () => {
     setMatchDialogOpen(false);
     setOddsDialogOpen(false);
@@ -179,6 +195,13 @@ export default function AdminMatchesPage() {
                 ))}
               </TableBody>
             </Table>
+            {nextCursor && (
+              <div className="flex justify-center mt-4">
+                <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                  {loadingMore ? 'Загрузка...' : 'Показать еще'}
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
       </motion.div>
@@ -2,6 +2,7 @@
 import { useEffect, useState } from "react";
 import { motion } from "framer-motion";
 import Link from "next/link";
+import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import apiClient from "@/libraries/apiClient";
 import { Match, Team } from "@/types";
@@ -9,19 +10,22 @@ import { Match, Team } from "@/types";
 export default function MatchesPage() {
   const [matches, setMatches] = useState<Match[]>([]);
   const [teams, setTeams] = useState<Team[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchMatchesAndTeams = async () => {
       try {
-        const [matchesRes, teamsRes] = await Promise.all([
-          apiClient.matches.getAll(),
+        const [matchesPage, teamsRes] = await Promise.all([
+          apiClient.matches.getPage(),
           apiClient.teams.getAll(),
         ]);
-        if (Array.isArray(matchesRes.data)) {
-          setMatches(matchesRes.data);
+        if (Array.isArray(matchesPage.items)) {
+          setMatches(matchesPage.items);
+          setNextCursor(matchesPage.nextCursor);
         } else {
-          console.error("Полученные данные о матчах не являются массивом:", matchesRes.data);
+          console.error("Полученные данные о матчах не являются массивом:", matchesPage.items);
         }
         if (Array.isArray(teamsRes.data)) {
           setTeams(teamsRes.data);
@@ -37,6 +41,19 @@ export default function MatchesPage() {
     fetchMatchesAndTeams();
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await apiClient.matches.getPage(nextCursor);
+      setMatches((prev) => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error("Ошибка при загрузке матчей:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getTeamName = (teamId: number) => {
     return teams.find((t) => t.id === teamId)?.name || `Команда ${teamId}`;
   };
@@ -80,6 +97,13 @@ export default function MatchesPage() {
           </motion.div>
         ))}
       </motion.div>
+      {nextCursor && (
+        <div className="flex justify-center mt-8">
+          <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? "Загрузка..." : "Показать еще"}
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
@@ -10,6 +10,7 @@ import {
   TableRow,
 } from "@/components/ui/table";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
+import { Button } from "@/components/ui/button";
 import apiClient from "@/libraries/apiClient";
 import { Bet, Match, Team } from "@/types";
 
@@ -17,18 +18,29 @@ export default function MyBetsPage() {
   const [bets, setBets] = useState<Bet[]>([]);
   const [matches, setMatches] = useState<Match[]>([]);
   const [teams, setTeams] = useState<Team[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState<boolean>(true);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
+
+  // Matches are paged too, so fetch only the ones this page of bets refers to.
+  const fetchMatchesFor = async (newBets: Bet[], known: Match[]) => {
+    const missing = Array.from(new Set(newBets.map((bet) => bet.match_id))).filter(
+      (id) => !known.some((m) => m.id === id),
+    );
+    const responses = await Promise.all(missing.map((id) => apiClient.matches.getById(String(id))));
+    return responses.map((response) => response.data);
+  };
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [betsRes, matchesRes, teamsRes] = await Promise.all([
+        const [betsPage, teamsRes] = await Promise.all([
           apiClient.bets.getMyBets(),
-          apiClient.matches.getAll(),
           apiClient.teams.getAll(),
         ]);
-        setBets(betsRes.data);
-        setMatches(matchesRes.data);
+        setBets(betsPage.items);
+        setNextCursor(betsPage.nextCursor);
+        setMatches(await fetchMatchesFor(betsPage.items, []));
         setTeams(teamsRes.data);
       } catch (error) {
         console.error("Ошибка при загрузке данных:", error);
@@ -39,6 +51,21 @@ export default function MyBetsPage() {
     fetchData();
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const betsPage = await apiClient.bets.getMyBets(nextCursor);
+      const newMatches = await fetchMatchesFor(betsPage.items, matches);
+      setBets((prev) => [...prev, ...betsPage.items]);
+      setMatches((prev) => [...prev, ...newMatches]);
+      setNextCursor(betsPage.nextCursor);
+    } catch (error) {
+      console.error("Ошибка при загрузке ставок:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getMatchDescription = (matchId: number) => {
     const match = matches.find((m) => m.id === matchId);
     if (!match) return "Н/Д";
@@ -124,6 +151,13 @@ export default function MyBetsPage() {
                 )}
               </TableBody>
             </Table>
+            {nextCursor && (
+              <div className="flex justify-center mt-4">
+                <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                  {loadingMore ? "Загрузка..." : "Показать еще"}
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
       </motion.div>
@@ -1,4 +1,4 @@
-import axios, { AxiosInstance } from 'axios';
+import axios, { AxiosInstance, AxiosResponse } from 'axios';
 import useAuthStore from '@/store/useAuthStore';
 import {
   Bet,
@@ -6,6 +6,7 @@ import {
   CreateMatchData,
   CreateTeamData,
   Match,
+  Page,
   Team,
   UpdateOddsData,
   UpdateTeamData,
@@ -44,6 +45,26 @@ axiosInstance.interceptors.response.use(
   },
 );
 
+// List endpoints return one page at a time and point to the next one with the
+// X-Next-Cursor header. Pass the cursor back to load the page after it.
+const getPage = async <T>(url: string, cursor?: string | null): Promise<Page<T>> => {
+  const response = await axiosInstance.get<T[]>(url, { params: cursor ? { cursor } : undefined });
+  return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+};
+
+// Only for short reference lists (teams) that pages need in full for lookups.
+const getAllPages = async <T>(url: string): Promise<AxiosResponse<T[]>> => {
+  let response = await axiosInstance.get<T[]>(url);
+  const items = [...response.data];
+  let cursor = response.headers['x-next-cursor'];
+  while (cursor) {
+    response = await axiosInstance.get<T[]>(url, { params: { cursor } });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  }
+  return { ...response, data: items };
+};
+
 const apiClient = {
   users: {
     getMe: () => axiosInstance.get<User>('/api/users/me'),
@@ -59,20 +80,20 @@ const apiClient = {
   },
   teams: {
     create: (data: CreateTeamData) => axiosInstance.post<Team>('/api/teams/', data),
-    getAll: () => axiosInstance.get<Team[]>('/api/teams/'),
+    getAll: () => getAllPages<Team>('/api/teams/'),
     getById: (id: string) => axiosInstance.get<Team>(`/api/teams/${id}`),
     update: (id: string, data: UpdateTeamData) => axiosInstance.put<Team>(`/api/teams/${id}`, data),
     delete: (id: string) => axiosInstance.delete(`/api/teams/${id}`),
   },
   matches: {
     create: (data: CreateMatchData) => axiosInstance.post<Match>('/api/matches/', data),
-    getAll: () => axiosInstance.get<Match[]>('/api/matches/'),
+    getPage: (cursor?: string | null) => getPage<Match>('/api/matches/', cursor),
     getById: (id: string) => axiosInstance.get<Match>(`/api/matches/${id}`),
     updateOdds: (id: string, data: UpdateOddsData) => axiosInstance.post(`/api/matches/${id}/odds`, data),
   },
   bets: {
     create: (data: CreateBetData) => axiosInstance.post<Bet>('/api/bets/', data),
-    getMyBets: () => axiosInstance.get<Bet[]>('/api/bets/'),
+    getMyBets: (cursor?: string | null) => getPage<Bet>('/api/bets/', cursor),
   },
   admin: {
     completeMatch: (matchId: number) => axiosInstance.post(`/api/matches/${matchId}/complete`),
@@ -76,4 +76,9 @@ export interface Bet {
   odds_on_bet?: number;
   user_id?: number;
   created_at?: string;
-}
\ No newline at end of file
+}
+
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
@@ -0,0 +1,36 @@
+from common.cache import TTLCache
+from common.config import env_int, env_float
+from common.singleflight import SingleFlight
+
+MATCH_CACHE_TTL = env_float("MATCH_CACHE_TTL", 5.0)
+MATCH_CACHE_SIZE = env_int("MATCH_CACHE_SIZE", 10000)
+MATCH_LIST_CACHE_SIZE = env_int("MATCH_LIST_CACHE_SIZE", 256)
+
+match_cache = TTLCache(MATCH_CACHE_SIZE, MATCH_CACHE_TTL)
+match_list_cache = TTLCache(MATCH_LIST_CACHE_SIZE, MATCH_CACHE_TTL)
+match_loads = SingleFlight()
+
+# Bumped on every invalidation so a read that raced with a write does not
+# store its (possibly stale) result after the write has cleared the cache.
+generation = 0
+
+
+def invalidate_match(match_id: int = None):
+    global generation
+    generation += 1
+    if match_id is not None:
+        match_cache.delete(match_id)
+    match_list_cache.clear()
+
+
+def store(cache: TTLCache, key, value, read_generation: int):
+    if read_generation == generation:
+        cache.set(key, value)
+
+
+def stats() -> dict:
+    return {
+        "matches": match_cache.stats(),
+        "lists": match_list_cache.stats(),
+        "loads": match_loads.stats(),
+    }
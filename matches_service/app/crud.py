@@ -1,14 +1,12 @@
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from . import models, schemas
+from . import models, schemas, cache, events
 import httpx
-import os
 import random
-from datetime import datetime, timezone
 from sqlalchemy.orm import selectinload
- 
-BETS_SERVICE_URL = os.getenv("BETS_SERVICE_URL", "http://bets_service:80")
-USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://user_service:80")
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import insert
+from common.writes import insert_returning, update_returning
  
  
 async def get_match(db: AsyncSession, match_id: int):
@@ -20,106 +18,125 @@ async def get_match(db: AsyncSession, match_id: int):
     return result.scalars().first()
 
 
-async def get_matches(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(
-        select(models.Match).options(selectinload(models.Match.odds)).offset(skip).limit(limit)
-    )
-    return result.scalars().all()
+async def get_matches(db: AsyncSession, after_id: int = None, limit: int = 100):
+    query = select(
+        models.Match.home_team_id,
+        models.Match.away_team_id,
+        models.Match.start_time,
+        models.Match.id,
+        models.Match.status,
+        models.Match.result,
+        models.Match.winner_id,
+        models.Match.completed_time,
+        models.Odds.win_home,
+        models.Odds.draw,
+        models.Odds.win_away,
+        models.Odds.id.label("odds_id"),
+        models.Odds.updated_at.label("odds_updated_at"),
+    ).outerjoin(models.Odds, models.Odds.match_id == models.Match.id)
+    if after_id is not None:
+        query = query.filter(models.Match.id > after_id)
+    result = await db.execute(query.order_by(models.Match.id).limit(limit))
+    return result.all()
 
 
 async def create_match(db: AsyncSession, match: schemas.MatchCreate):
-    db_match = models.Match(**match.dict())
-    db.add(db_match)
+    db_match = await insert_returning(db, models.Match, match.dict())
+    await db.commit()
+    set_committed_value(db_match, "odds", None)
+    cache.invalidate_match()
+    events.publish_status(db_match)
+    return db_match
+
+
+async def create_matches_bulk(db: AsyncSession, matches: list):
+    result = await db.execute(
+        insert(models.Match).returning(models.Match.id, sort_by_parameter_order=True),
+        [match.dict(exclude={"odds"}) for match in matches],
+    )
+    ids = result.scalars().all()
+    odds_rows = [
+        {**match.odds.dict(), "match_id": match_id}
+        for match, match_id in zip(matches, ids)
+        if match.odds is not None
+    ]
+    if odds_rows:
+        await db.execute(insert(models.Odds), odds_rows)
     await db.commit()
-    await db.refresh(db_match)
-    return await get_match(db, db_match.id)
+    cache.invalidate_match()
+    events.publish_bulk_created(ids)
+    return ids
 
 
 async def create_match_odds(db: AsyncSession, match_id: int, odds: schemas.OddsCreate):
-    db_odds = models.Odds(**odds.dict(), match_id=match_id)
-    db.add(db_odds)
+    db_odds = await insert_returning(
+        db, models.Odds, {**odds.dict(), "match_id": match_id}
+    )
     await db.commit()
-    await db.refresh(db_odds)
+    cache.invalidate_match(match_id)
+    events.publish_odds(db_odds)
     return db_odds
 
 
 async def update_odds(db: AsyncSession, match_id: int, odds: schemas.OddsCreate):
-    result = await db.execute(select(models.Odds).filter(models.Odds.match_id == match_id))
-    db_odds = result.scalars().first()
+    db_odds = await update_returning(
+        db,
+        models.Odds,
+        [models.Odds.match_id == match_id],
+        odds.dict(exclude_unset=True),
+    )
+    await db.commit()
     if db_odds:
-        odds_data = odds.dict(exclude_unset=True)
-        for key, value in odds_data.items():
-            setattr(db_odds, key, value)
-        await db.commit()
-        await db.refresh(db_odds)
+        cache.invalidate_match(match_id)
+        events.publish_odds(db_odds)
     return db_odds
  
  
-async def complete_match(db: AsyncSession, match_id: int, token: str):
-    db_match = await get_match(db, match_id)
-    if not db_match:
-        raise httpx.HTTPStatusError(404, "Match not found", request=None, response=None)
-    if db_match.status != "active":
-        raise httpx.HTTPStatusError(400, "Match is not active", request=None, response=None)
- 
-    db_match.status = "processing"
-    await db.commit()
-    await db.refresh(db_match)
- 
-    try:
-        participants = [db_match.home_team_id, db_match.away_team_id]
-        winner_id = random.choice(participants)
-        
-        winning_outcome = "win_home" if winner_id == db_match.home_team_id else "win_away"
- 
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {token}"}
-            
-            settle_response = await client.post(
-                f"{BETS_SERVICE_URL}/matches/{match_id}/settle",
-                json={"winning_outcome": winning_outcome},
-                headers=headers
-            )
-            settle_response.raise_for_status()
+async def get_settlement_job(db: AsyncSession, match_id: int):
+    result = await db.execute(
+        select(models.SettlementJob).filter(models.SettlementJob.match_id == match_id)
+    )
+    return result.scalars().first()
 
-            response = await client.get(
-                f"{BETS_SERVICE_URL}/matches/{match_id}/bets/", headers=headers
+
+async def complete_match(db: AsyncSession, db_match: models.Match):
+    db_job = await get_settlement_job(db, db_match.id)
+    if db_job is not None:
+        if db_job.status == "failed":
+            db_job = await update_returning(
+                db,
+                models.SettlementJob,
+                [models.SettlementJob.id == db_job.id],
+                {"status": "pending", "attempts": 0, "locked_until": None},
             )
-            response.raise_for_status()
-            bets = response.json()
- 
-            total_pot = sum(bet["amount_staked"] for bet in bets)
-            
-            winning_bets = [
-                bet for bet in bets if bet["outcome"] == winning_outcome
-            ]
-            total_winning_stake = sum(bet["amount_staked"] for bet in winning_bets)
-    
-            if total_winning_stake > 0:
-                for bet in winning_bets:
-                    try:
-                        payout = (bet["amount_staked"] / total_winning_stake) * total_pot
-                        
-                        await client.patch(
-                            f"{USER_SERVICE_URL}/users/{bet['user_id']}/wallet",
-                            json={"amount": payout},
-                            headers=headers,
-                        )
-                    except Exception as e:
-                        print(f"Error paying user {bet['user_id']}: {e}")
- 
-        db_match.status = "completed"
-        db_match.winner_id = winner_id
-        db_match.completed_time = datetime.now(timezone.utc)
-        await db.commit()
-        await db.refresh(db_match)
- 
-        return db_match
- 
-    except Exception as e:
-        db_match.status = "active"
-        await db.commit()
-        raise e
+            await db.commit()
+        return db_job
+
+    processing = await update_returning(
+        db,
+        models.Match,
+        [models.Match.id == db_match.id, models.Match.status == "active"],
+        {"status": "processing"},
+    )
+    if processing is None:
+        await db.rollback()
+        return None
+
+    winner_id = random.choice([db_match.home_team_id, db_match.away_team_id])
+    winning_outcome = "win_home" if winner_id == db_match.home_team_id else "win_away"
+    db_job = await insert_returning(
+        db,
+        models.SettlementJob,
+        {
+            "match_id": db_match.id,
+            "winner_id": winner_id,
+            "winning_outcome": winning_outcome,
+        },
+    )
+    await db.commit()
+    cache.invalidate_match(db_match.id)
+    events.publish_status_change(db_match.id, "processing")
+    return db_job
 
 
 async def start_match(db: AsyncSession, match_id: int):
@@ -133,7 +150,8 @@ async def start_match(db: AsyncSession, match_id: int):
 
     db_match.status = "active"
     await db.commit()
-    await db.refresh(db_match)
+    cache.invalidate_match(match_id)
+    events.publish_status(db_match)
     return db_match
 
 
@@ -148,5 +166,6 @@ async def start_match(db: AsyncSession, match_id: int):
 
     db_match.status = "active"
     await db.commit()
-    await db.refresh(db_match)
+    cache.invalidate_match(match_id)
+    events.publish_status(db_match)
     return db_match
@@ -0,0 +1,44 @@
+from . import schemas
+from common.broadcast import Broadcaster
+from common.config import env_int, env_float
+
+STREAM_QUEUE_SIZE = env_int("STREAM_QUEUE_SIZE", 100)
+STREAM_HEARTBEAT_SECONDS = env_float("STREAM_HEARTBEAT_SECONDS", 15.0)
+
+broadcaster = Broadcaster(STREAM_QUEUE_SIZE)
+
+
+def publish_odds(db_odds):
+    broadcaster.publish(
+        db_odds.match_id,
+        {
+            "type": "odds",
+            "match_id": db_odds.match_id,
+            "odds": schemas.Odds.model_validate(db_odds).model_dump(mode="json"),
+        },
+    )
+
+
+def publish_status(db_match):
+    publish_status_change(db_match.id, db_match.status, db_match.winner_id)
+
+
+def publish_status_change(match_id: int, status: str, winner_id: int = None):
+    broadcaster.publish(
+        match_id,
+        {
+            "type": "status",
+            "match_id": match_id,
+            "status": status,
+            "winner_id": winner_id,
+        },
+    )
+
+
+# One event for the whole batch: per-match events published in a single
+# synchronous loop would overflow every all-matches subscriber's queue.
+def publish_bulk_created(match_ids: list):
+    broadcaster.publish(
+        None,
+        {"type": "bulk_created", "match_ids": list(match_ids), "status": "scheduled"},
+    )
@@ -1,26 +1,74 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from . import crud, models, schemas, auth
-from .database import get_db, engine
+from pydantic import TypeAdapter
+from typing import List, Optional
+from . import crud, models, schemas, cache, events, settlement
+from .database import get_db, engine, async_session
+from common import auth, database, metrics, pagination, serialization, tracing
+from common.cache import CachedResponse, etag_response
+from .upstreams import upstreams
+import asyncio
+import json
 import os
 import logging
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format=tracing.LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 ROOT_PATH = os.getenv("ROOT_PATH", "")
 app = FastAPI(root_path=ROOT_PATH)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware, service_name="matches_service")
 
 router = APIRouter()
 
+match_adapter = TypeAdapter(schemas.Match)
+
+
+def match_record(row) -> dict:
+    return {
+        "home_team_id": row.home_team_id,
+        "away_team_id": row.away_team_id,
+        "start_time": row.start_time,
+        "id": row.id,
+        "status": row.status,
+        "result": row.result,
+        "winner_id": row.winner_id,
+        "completed_time": row.completed_time,
+        "odds": {
+            "win_home": row.win_home,
+            "draw": row.draw,
+            "win_away": row.win_away,
+            "id": row.odds_id,
+            "match_id": row.id,
+            "updated_at": row.odds_updated_at,
+        }
+        if row.odds_id is not None
+        else None,
+    }
+
 
 @app.on_event("startup")
 async def startup():
     logger.info(f"FastAPI app starting with ROOT_PATH: {ROOT_PATH}")
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+    await upstreams.start()
+    await tracing.processor.start()
+    app.state.settlement_task = asyncio.create_task(
+        settlement.settlement_loop(async_session)
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    settlement_task = getattr(app.state, "settlement_task", None)
+    if settlement_task:
+        settlement_task.cancel()
+    await upstreams.close()
+    await tracing.processor.shutdown()
 
 
 def is_admin(user: auth.User = Depends(auth.get_current_user)):
@@ -38,20 +86,92 @@ async def create_match(match: schemas.MatchCreate, db: AsyncSession = Depends(ge
     return await crud.create_match(db=db, match=match)
 
 
+@router.post(
+    "/matches/bulk",
+    response_model=schemas.MatchBulkResult,
+    dependencies=[Depends(is_admin)],
+)
+async def create_matches_bulk(
+    bulk: schemas.MatchBulkCreate, db: AsyncSession = Depends(get_db)
+):
+    ids = await crud.create_matches_bulk(db=db, matches=bulk.matches)
+    return {"ids": ids}
+
+
 @router.get("/matches/", response_model=List[schemas.Match])
 async def read_matches(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
 ):
-    matches = await crud.get_matches(db, skip=skip, limit=limit)
-    return matches
+    key = (cursor, limit)
+    cached = cache.match_list_cache.get(key)
+    if cached is None:
+        generation = cache.generation
+        after_id = pagination.decode_cursor(cursor, (int,))[0] if cursor else None
+        matches = await crud.get_matches(db, after_id=after_id, limit=limit)
+        next_cursor = pagination.next_cursor(matches, limit, lambda m: (m.id,))
+        cached = CachedResponse(
+            serialization.dumps([match_record(row) for row in matches]),
+            {pagination.NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None,
+        )
+        cache.store(cache.match_list_cache, key, cached, generation)
+    return etag_response(request, cached)
 
 
-@router.get("/matches/{match_id}", response_model=schemas.Match)
-async def read_match(match_id: int, db: AsyncSession = Depends(get_db)):
-    db_match = await crud.get_match(db, match_id=match_id)
+@router.get("/matches/stream")
+async def stream_matches(match_id: Optional[int] = None):
+    subscription = events.broadcaster.subscribe(match_id)
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), timeout=events.STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            events.broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def load_match(match_id: int, generation: int):
+    async with async_session() as db:
+        db_match = await crud.get_match(db, match_id=match_id)
     if db_match is None:
-        raise HTTPException(status_code=404, detail="Match not found")
-    return db_match
+        return None
+    cached = CachedResponse(
+        match_adapter.dump_json(match_adapter.validate_python(db_match, from_attributes=True))
+    )
+    cache.store(cache.match_cache, match_id, cached, generation)
+    return cached
+
+
+@router.get("/matches/{match_id}", response_model=schemas.Match)
+async def read_match(match_id: int, request: Request):
+    cached = cache.match_cache.get(match_id)
+    if cached is None:
+        # Keyed by generation so a read arriving after a write never joins a
+        # load that started before it.
+        generation = cache.generation
+        cached = await cache.match_loads.do(
+            (match_id, generation), lambda: load_match(match_id, generation)
+        )
+        if cached is None:
+            raise HTTPException(status_code=404, detail="Match not found")
+    return etag_response(request, cached)
 
 
 @router.post(
@@ -78,19 +198,31 @@ async def update_odds_for_match(
  
 @router.post(
     "/matches/{match_id}/complete",
-    response_model=schemas.Match,
+    response_model=schemas.SettlementJob,
+    status_code=202,
     dependencies=[Depends(is_admin)],
 )
-async def complete_match(
-    match_id: int,
-    db: AsyncSession = Depends(get_db),
-    user: auth.User = Depends(is_admin),
-):
-    try:
-        return await crud.complete_match(db=db, match_id=match_id, token=user.token)
-    except Exception as e:
-        logger.error(f"Error completing match {match_id}: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+async def complete_match(match_id: int, db: AsyncSession = Depends(get_db)):
+    db_match = await crud.get_match(db, match_id=match_id)
+    if db_match is None:
+        raise HTTPException(status_code=404, detail="Match not found")
+    db_job = await crud.complete_match(db=db, db_match=db_match)
+    if db_job is None:
+        raise HTTPException(status_code=400, detail="Match is not active")
+    settlement.wake()
+    return db_job
+
+
+@router.get(
+    "/matches/{match_id}/settlement",
+    response_model=schemas.SettlementJob,
+    dependencies=[Depends(is_admin)],
+)
+async def read_settlement(match_id: int, db: AsyncSession = Depends(get_db)):
+    db_job = await crud.get_settlement_job(db, match_id=match_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Settlement not found")
+    return db_job
  
  
 @router.post(
@@ -114,4 +246,34 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return metrics.metrics_response(engine=engine, upstreams=upstreams)
+
+
+@app.get("/internal/auth-cache")
+async def auth_cache_stats():
+    return auth.token_cache.stats()
+
+
+@app.get("/internal/db-pool")
+async def db_pool_stats():
+    return database.pool_stats(engine)
+
+
+@app.get("/internal/upstreams")
+async def upstream_stats():
+    return upstreams.stats()
+
+
+@app.get("/internal/cache")
+async def cache_stats():
+    return cache.stats()
+
+
+@app.get("/internal/stream")
+async def stream_stats():
+    return events.broadcaster.stats()
+
+
 app.include_router(router)
@@ -36,3 +36,26 @@ class Odds(Base):
     win_away = Column(Numeric(5, 2), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     match = relationship("Match", back_populates="odds")
+
+
+class SettlementJob(Base):
+    __tablename__ = "settlement_jobs"
+
+    id = Column(Integer, primary_key=True)
+    match_id = Column(Integer, ForeignKey("matches.id"), unique=True, nullable=False)
+    winner_id = Column(Integer, nullable=False)
+    winning_outcome = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)
+    phase = Column(String, nullable=False, default="settle")
+    cursor = Column(String, nullable=True)
+    bets_total = Column(Integer, nullable=False, default=0)
+    total_pot = Column(Numeric(14, 2), nullable=False, default=0)
+    total_winning_stake = Column(Numeric(14, 2), nullable=False, default=0)
+    payouts_sent = Column(Integer, nullable=False, default=0)
+    amount_paid = Column(Numeric(14, 2), nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 
 
 class MatchBase(BaseModel):
@@ -52,3 +52,36 @@ class Match(MatchBase):
 
     class Config:
         from_attributes = True
+
+
+class MatchBulkItem(MatchCreate):
+    odds: Optional[OddsCreate] = None
+
+
+class MatchBulkCreate(BaseModel):
+    matches: List[MatchBulkItem] = Field(min_length=1, max_length=10000)
+
+
+class MatchBulkResult(BaseModel):
+    ids: List[int]
+
+
+class SettlementJob(BaseModel):
+    match_id: int
+    winner_id: int
+    winning_outcome: str
+    status: str
+    phase: str
+    bets_total: int
+    total_pot: float
+    total_winning_stake: float
+    payouts_sent: int
+    amount_paid: float
+    attempts: int
+    last_error: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    completed_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
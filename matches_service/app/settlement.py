@@ -0,0 +1,230 @@
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import asyncio
+import logging
+import time
+from . import models, cache, events
+from .upstreams import bets_service, user_service
+from common import auth, tracing
+from common.config import env_int, env_float
+from common.pagination import NEXT_CURSOR_HEADER
+from common.writes import update_returning
+
+logger = logging.getLogger(__name__)
+
+PAYOUT_CHUNK_SIZE = env_int("PAYOUT_CHUNK_SIZE", 500)
+BETS_PAGE_SIZE = env_int("BETS_PAGE_SIZE", 1000)
+SETTLEMENT_POLL_SECONDS = env_float("SETTLEMENT_POLL_SECONDS", 5.0)
+SETTLEMENT_LEASE_SECONDS = env_int("SETTLEMENT_LEASE_SECONDS", 60)
+SETTLEMENT_MAX_ATTEMPTS = env_int("SETTLEMENT_MAX_ATTEMPTS", 10)
+SETTLEMENT_MAX_BACKOFF_SECONDS = env_int("SETTLEMENT_MAX_BACKOFF_SECONDS", 300)
+SERVICE_TOKEN_MINUTES = env_int("SERVICE_TOKEN_MINUTES", 30)
+
+_wakeup = asyncio.Event()
+_service_token = None
+_service_token_refresh_at = 0.0
+
+
+def wake():
+    _wakeup.set()
+
+
+def service_headers() -> dict:
+    global _service_token, _service_token_refresh_at
+    now = time.monotonic()
+    if _service_token is None or now >= _service_token_refresh_at:
+        _service_token = auth.create_access_token(
+            {"sub": "matches-service", "id": 0, "role": "admin"},
+            expires_delta=timedelta(minutes=SERVICE_TOKEN_MINUTES),
+        )
+        _service_token_refresh_at = now + SERVICE_TOKEN_MINUTES * 30
+    return {"Authorization": f"Bearer {_service_token}"}
+
+
+async def claim_job(db: AsyncSession):
+    now = datetime.now(timezone.utc)
+    claimable = [
+        models.SettlementJob.status.in_(("pending", "running")),
+        or_(
+            models.SettlementJob.locked_until.is_(None),
+            models.SettlementJob.locked_until < now,
+        ),
+    ]
+    candidate = (
+        select(models.SettlementJob.id)
+        .where(*claimable)
+        .order_by(models.SettlementJob.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    db_job = await update_returning(
+        db,
+        models.SettlementJob,
+        [models.SettlementJob.id == candidate, *claimable],
+        {
+            "status": "running",
+            "locked_until": now + timedelta(seconds=SETTLEMENT_LEASE_SECONDS),
+        },
+    )
+    await db.commit()
+    return db_job
+
+
+async def fetch_winners_page(db_job: models.SettlementJob, headers: dict):
+    params = {"limit": BETS_PAGE_SIZE, "status": "won"}
+    if db_job.cursor:
+        params["cursor"] = db_job.cursor
+    response = await bets_service.get(
+        f"/matches/{db_job.match_id}/bets/", params=params, headers=headers
+    )
+    response.raise_for_status()
+    return response.json(), response.headers.get(NEXT_CURSOR_HEADER)
+
+
+async def settle(db: AsyncSession, db_job: models.SettlementJob, headers: dict):
+    response = await bets_service.post(
+        f"/matches/{db_job.match_id}/settle",
+        json={"winning_outcome": db_job.winning_outcome},
+        headers=headers,
+    )
+    response.raise_for_status()
+    totals = response.json()
+    return {
+        "phase": "payout" if totals["winners"] else "finalize",
+        "cursor": None,
+        "bets_total": totals["bets_total"],
+        "total_pot": Decimal(str(totals["total_pot"])),
+        "total_winning_stake": Decimal(str(totals["total_winning_stake"])),
+    }
+
+
+async def pay_winners(db: AsyncSession, db_job: models.SettlementJob, headers: dict):
+    bets, cursor = await fetch_winners_page(db_job, headers)
+    credits = [
+        {"user_id": bet["user_id"], "amount": bet["payout"]}
+        for bet in bets
+        if bet["payout"]
+    ]
+    for index, start in enumerate(range(0, len(credits), PAYOUT_CHUNK_SIZE)):
+        response = await user_service.post(
+            "/wallets/credits",
+            json={
+                "credits": credits[start : start + PAYOUT_CHUNK_SIZE],
+                "batch_key": f"settlement:{db_job.id}:{db_job.cursor or ''}:{index}",
+            },
+            headers=headers,
+        )
+        response.raise_for_status()
+    values = {
+        "cursor": cursor,
+        "payouts_sent": db_job.payouts_sent + len(credits),
+        "amount_paid": db_job.amount_paid
+        + sum(Decimal(str(credit["amount"])) for credit in credits),
+    }
+    if not cursor:
+        values["phase"] = "finalize"
+    return values
+
+
+async def finalize(db: AsyncSession, db_job: models.SettlementJob, headers: dict):
+    now = datetime.now(timezone.utc)
+    await update_returning(
+        db,
+        models.Match,
+        [models.Match.id == db_job.match_id],
+        {"status": "completed", "winner_id": db_job.winner_id, "completed_time": now},
+    )
+    return {
+        "phase": "done",
+        "status": "completed",
+        "locked_until": None,
+        "completed_at": now,
+    }
+
+
+PHASES = {
+    "settle": settle,
+    "payout": pay_winners,
+    "finalize": finalize,
+}
+
+
+async def run_step(db: AsyncSession, db_job: models.SettlementJob):
+    with tracing.start_span(
+        f"settlement {db_job.phase}",
+        service="matches_service",
+        attributes={"match_id": db_job.match_id, "settlement.phase": db_job.phase},
+    ):
+        values = await PHASES[db_job.phase](db, db_job, service_headers())
+    if values.get("status") != "completed":
+        values["locked_until"] = datetime.now(timezone.utc) + timedelta(
+            seconds=SETTLEMENT_LEASE_SECONDS
+        )
+    values["attempts"] = 0
+    values["last_error"] = None
+    db_job = await update_returning(
+        db, models.SettlementJob, [models.SettlementJob.id == db_job.id], values
+    )
+    await db.commit()
+    if db_job.status == "completed":
+        cache.invalidate_match(db_job.match_id)
+        events.publish_status_change(db_job.match_id, "completed", db_job.winner_id)
+    return db_job
+
+
+async def record_failure(db: AsyncSession, db_job: models.SettlementJob, error: Exception):
+    attempts = db_job.attempts + 1
+    values = {"attempts": attempts, "last_error": str(error)[:1000]}
+    if attempts >= SETTLEMENT_MAX_ATTEMPTS:
+        values["status"] = "failed"
+        values["locked_until"] = None
+    else:
+        backoff = min(2 ** attempts, SETTLEMENT_MAX_BACKOFF_SECONDS)
+        values["locked_until"] = datetime.now(timezone.utc) + timedelta(seconds=backoff)
+    await update_returning(
+        db, models.SettlementJob, [models.SettlementJob.id == db_job.id], values
+    )
+    await db.commit()
+
+
+async def process_job(session_factory, db_job: models.SettlementJob):
+    while db_job.status == "running":
+        async with session_factory() as db:
+            try:
+                db_job = await run_step(db, db_job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    f"Settlement of match {db_job.match_id} failed in phase {db_job.phase}: {e}"
+                )
+                await db.rollback()
+                await record_failure(db, db_job, e)
+                return
+
+
+async def run_pending(session_factory):
+    while True:
+        async with session_factory() as db:
+            db_job = await claim_job(db)
+        if db_job is None:
+            return
+        await process_job(session_factory, db_job)
+
+
+async def settlement_loop(session_factory):
+    while True:
+        _wakeup.clear()
+        try:
+            await run_pending(session_factory)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Settlement worker failed: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=SETTLEMENT_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,6 @@
+from common.http_client import Upstream, UpstreamRegistry
+
+bets_service = Upstream.from_env("bets_service", "http://bets_service:80")
+user_service = Upstream.from_env("user_service", "http://user_service:80")
+
+upstreams = UpstreamRegistry(bets_service, user_service)
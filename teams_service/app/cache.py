@@ -0,0 +1,41 @@
+from common.cache import TTLCache
+from common.config import env_int, env_float
+from common.singleflight import SingleFlight
+
+TEAM_CACHE_TTL = env_float("TEAM_CACHE_TTL", 300.0)
+TEAM_CACHE_SIZE = env_int("TEAM_CACHE_SIZE", 10000)
+
+team_cache = TTLCache(TEAM_CACHE_SIZE, TEAM_CACHE_TTL)
+team_loads = SingleFlight()
+
+# Bumped on every invalidation so a read that raced with a write does not
+# store its (possibly stale) result after the write has cleared the cache.
+generation = 0
+
+
+def invalidate_team(team_id: int):
+    global generation
+    generation += 1
+    team_cache.delete(team_id)
+
+
+def get_many(team_ids: list):
+    found = {}
+    missing = []
+    for team_id in team_ids:
+        team = team_cache.get(team_id)
+        if team is None:
+            missing.append(team_id)
+        else:
+            found[team_id] = team
+    return found, missing
+
+
+def store_many(teams: list, read_generation: int):
+    if read_generation == generation:
+        for team in teams:
+            team_cache.set(team.id, team)
+
+
+def stats() -> dict:
+    return {"teams": team_cache.stats(), "loads": team_loads.stats()}
@@ -1,6 +1,7 @@
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from . import models, schemas
+from . import models, schemas, cache
+from common.writes import insert_returning, update_returning
 
 
 async def get_team(db: AsyncSession, team_id: int):
@@ -8,8 +9,16 @@ async def get_team(db: AsyncSession, team_id: int):
     return result.scalars().first()
 
 
-async def get_teams(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(select(models.Team).offset(skip).limit(limit))
+async def get_teams(db: AsyncSession, after_id: int = None, limit: int = 100):
+    query = select(models.Team.name, models.Team.country, models.Team.id)
+    if after_id is not None:
+        query = query.filter(models.Team.id > after_id)
+    result = await db.execute(query.order_by(models.Team.id).limit(limit))
+    return result.all()
+
+
+async def get_teams_by_ids(db: AsyncSession, team_ids: list):
+    result = await db.execute(select(models.Team).filter(models.Team.id.in_(team_ids)))
     return result.scalars().all()
 
 
@@ -17,21 +26,17 @@ async def create_team(db: AsyncSession, team: schemas.TeamCreate):
     result = await db.execute(select(models.Team).filter(models.Team.name == team.name))
     if result.scalars().first():
         return None
-    db_team = models.Team(**team.dict())
-    db.add(db_team)
+    db_team = await insert_returning(db, models.Team, team.dict())
     await db.commit()
-    await db.refresh(db_team)
     return db_team
 
 
 async def update_team(db: AsyncSession, team_id: int, team: schemas.TeamCreate):
-    db_team = await get_team(db, team_id)
-    if db_team:
-        team_data = team.dict(exclude_unset=True)
-        for key, value in team_data.items():
-            setattr(db_team, key, value)
-        await db.commit()
-        await db.refresh(db_team)
+    db_team = await update_returning(
+        db, models.Team, [models.Team.id == team_id], team.dict(exclude_unset=True)
+    )
+    await db.commit()
+    cache.invalidate_team(team_id)
     return db_team
 
 
@@ -40,4 +45,5 @@ async def delete_team(db: AsyncSession, team_id: int):
     if db_team:
         await db.delete(db_team)
         await db.commit()
+        cache.invalidate_team(team_id)
     return db_team
@@ -1,17 +1,20 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from . import crud, models, schemas, auth
-from .database import get_db, engine
+from typing import List, Optional
+from . import crud, models, schemas, cache
+from .database import get_db, engine, async_session
+from common import auth, database, metrics, pagination, serialization, tracing
 import os
 import logging
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format=tracing.LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 ROOT_PATH = os.getenv("ROOT_PATH", "")
 app = FastAPI(root_path=ROOT_PATH)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware, service_name="teams_service")
 
 
 router = APIRouter()
@@ -22,6 +25,12 @@ async def startup():
     logger.info(f"FastAPI app starting with ROOT_PATH: {ROOT_PATH}")
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+    await tracing.processor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await tracing.processor.shutdown()
 
 
 def is_admin(user: auth.User = Depends(auth.get_current_user)):
@@ -40,20 +49,64 @@ async def create_team(team: schemas.TeamCreate, db: AsyncSession = Depends(get_d
     return db_team
 
 
+def parse_ids(ids: str) -> List[int]:
+    try:
+        team_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(team_ids) > pagination.MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {pagination.MAX_PAGE_SIZE} ids can be requested at once",
+        )
+    return team_ids
+
+
+async def load_teams(team_ids: List[int], generation: int) -> list:
+    async with async_session() as db:
+        db_teams = await crud.get_teams_by_ids(db, team_ids=team_ids)
+    loaded = [schemas.Team.model_validate(db_team) for db_team in db_teams]
+    cache.store_many(loaded, generation)
+    return loaded
+
+
+async def get_teams_cached(team_ids: List[int]) -> dict:
+    teams, missing = cache.get_many(team_ids)
+    if missing:
+        generation = cache.generation
+        loaded = await cache.team_loads.do(
+            (tuple(missing), generation), lambda: load_teams(missing, generation)
+        )
+        teams.update((team.id, team) for team in loaded)
+    return teams
+
+
 @router.get("/teams/", response_model=List[schemas.Team])
 async def read_teams(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    ids: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
 ):
-    teams = await crud.get_teams(db, skip=skip, limit=limit)
-    return teams
+    if ids is not None:
+        team_ids = parse_ids(ids)
+        teams = await get_teams_cached(team_ids)
+        return [teams[team_id] for team_id in team_ids if team_id in teams]
+
+    after_id = pagination.decode_cursor(cursor, (int,))[0] if cursor else None
+    teams = await crud.get_teams(db, after_id=after_id, limit=limit)
+    return serialization.json_response(
+        serialization.rows_to_json(teams),
+        pagination.next_cursor(teams, limit, lambda t: (t.id,)),
+    )
 
 
 @router.get("/teams/{team_id}", response_model=schemas.Team)
-async def read_team(team_id: int, db: AsyncSession = Depends(get_db)):
-    db_team = await crud.get_team(db, team_id=team_id)
-    if db_team is None:
+async def read_team(team_id: int):
+    teams = await get_teams_cached([team_id])
+    if team_id not in teams:
         raise HTTPException(status_code=404, detail="Team not found")
-    return db_team
+    return teams[team_id]
 
 
 @router.put(
@@ -62,7 +115,10 @@ async def read_team(team_id: int, db: AsyncSession = Depends(get_db)):
 async def update_team(
     team_id: int, team: schemas.TeamCreate, db: AsyncSession = Depends(get_db)
 ):
-    return await crud.update_team(db=db, team_id=team_id, team=team)
+    db_team = await crud.update_team(db=db, team_id=team_id, team=team)
+    if db_team is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return db_team
 
 
 @router.delete(
@@ -80,4 +136,24 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return metrics.metrics_response(engine=engine)
+
+
+@app.get("/internal/auth-cache")
+async def auth_cache_stats():
+    return auth.token_cache.stats()
+
+
+@app.get("/internal/db-pool")
+async def db_pool_stats():
+    return database.pool_stats(engine)
+
+
+@app.get("/internal/cache")
+async def cache_stats():
+    return cache.stats()
+
+
 app.include_router(router)
@@ -0,0 +1,38 @@
+from . import schemas
+from common.cache import TTLCache
+from common.config import env_int, env_float
+from common.singleflight import SingleFlight
+
+WALLET_CACHE_TTL = env_float("WALLET_CACHE_TTL", 5.0)
+WALLET_CACHE_SIZE = env_int("WALLET_CACHE_SIZE", 100000)
+
+wallet_cache = TTLCache(WALLET_CACHE_SIZE, WALLET_CACHE_TTL)
+wallet_loads = SingleFlight()
+
+# Bumped on every wallet write so a read arriving after the write never joins
+# a load that started before it.
+generation = 0
+
+
+def get_wallet(user_id: int, min_version: int = None):
+    wallet = wallet_cache.get(user_id)
+    if wallet is not None and min_version is not None and wallet.version < min_version:
+        return None
+    return wallet
+
+
+# Wallet versions only move forward, so a read that raced with a write cannot
+# replace the newer wallet the write stored.
+def store_wallet(wallet, written: bool = False) -> schemas.Wallet:
+    global generation
+    if written:
+        generation += 1
+    wallet = schemas.Wallet.model_validate(wallet)
+    cached = wallet_cache.peek(wallet.user_id)
+    if cached is None or cached.version <= wallet.version:
+        wallet_cache.set(wallet.user_id, wallet)
+    return wallet
+
+
+def stats() -> dict:
+    return {"wallets": wallet_cache.stats(), "loads": wallet_loads.stats()}
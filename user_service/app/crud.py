@@ -1,15 +1,18 @@
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from . import models, schemas
-from passlib.context import CryptContext
+from . import models, schemas, cache
+from common.passwords import hasher
+from common.writes import insert_returning, update_returning
 from sqlalchemy.orm import selectinload
+from sqlalchemy import update, case, insert
+from sqlalchemy.exc import IntegrityError
 from decimal import Decimal
+from common.config import env_int
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+CREDIT_CHUNK_SIZE = env_int("CREDIT_CHUNK_SIZE", 1000)
 
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await hasher.hash(password)
 
 
 async def get_user_by_email(db: AsyncSession, email: str):
@@ -21,28 +24,114 @@ async def get_user_by_email(db: AsyncSession, email: str):
     return result.scalars().first()
 
 
-async def create_user(db: AsyncSession, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
-    db_user = models.User(
-        email=user.email, hashed_password=hashed_password, role=user.role
+async def get_wallet_by_user_id(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models.Wallet).filter(models.Wallet.user_id == user_id)
     )
-    db.add(db_user)
-    await db.commit()
-    await db.refresh(db_user)
+    return result.scalars().first()
 
-    wallet = models.Wallet(user_id=db_user.id)
-    db.add(wallet)
-    await db.commit()
-    await db.refresh(wallet)
 
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    hashed_password = await get_password_hash(user.password)
+    db_user = await insert_returning(
+        db,
+        models.User,
+        {"email": user.email, "hashed_password": hashed_password, "role": user.role},
+    )
+    await insert_returning(db, models.Wallet, {"user_id": db_user.id})
+    await db.commit()
     return db_user
 
 
 async def update_wallet_balance(db: AsyncSession, user_id: int, amount: float):
-    result = await db.execute(select(models.Wallet).filter(models.Wallet.user_id == user_id))
-    wallet = result.scalars().first()
+    wallet = await update_returning(
+        db,
+        models.Wallet,
+        [models.Wallet.user_id == user_id],
+        {
+            "balance": models.Wallet.balance + Decimal(str(amount)),
+            "version": models.Wallet.version + 1,
+        },
+    )
+    await db.commit()
     if wallet:
-        wallet.balance += Decimal(amount)
-        await db.commit()
-        await db.refresh(wallet)
+        cache.store_wallet(wallet, written=True)
     return wallet
+
+
+async def debit_wallet(db: AsyncSession, user_id: int, amount: float):
+    amount = Decimal(str(amount))
+    wallet = await update_returning(
+        db,
+        models.Wallet,
+        [models.Wallet.user_id == user_id, models.Wallet.balance >= amount],
+        {"balance": models.Wallet.balance - amount, "version": models.Wallet.version + 1},
+    )
+    await db.commit()
+    if wallet:
+        cache.store_wallet(wallet, written=True)
+    return wallet
+
+
+async def wallet_exists(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models.Wallet.id).filter(models.Wallet.user_id == user_id)
+    )
+    return result.first() is not None
+
+
+async def credit_wallets(db: AsyncSession, credits: list, batch_key: str = None):
+    if batch_key:
+        try:
+            await db.execute(insert(models.WalletCreditBatchKey).values(key=batch_key))
+        except IntegrityError:
+            await db.rollback()
+            return None
+
+    totals = {}
+    for credit in credits:
+        totals[credit.user_id] = totals.get(credit.user_id, Decimal(0)) + Decimal(
+            str(credit.amount)
+        )
+
+    # Duplicates are summed above; lock the wallets in user_id order so two
+    # overlapping batches cannot deadlock on each other.
+    wallets = {}
+    user_ids = sorted(totals)
+    for start in range(0, len(user_ids), CREDIT_CHUNK_SIZE):
+        chunk = user_ids[start : start + CREDIT_CHUNK_SIZE]
+        await db.execute(
+            select(models.Wallet.id)
+            .where(models.Wallet.user_id.in_(chunk))
+            .order_by(models.Wallet.user_id)
+            .with_for_update()
+        )
+        amount = case(
+            {user_id: totals[user_id] for user_id in chunk},
+            value=models.Wallet.user_id,
+        )
+        result = await db.execute(
+            update(models.Wallet)
+            .where(models.Wallet.user_id.in_(chunk))
+            .values(balance=models.Wallet.balance + amount, version=models.Wallet.version + 1)
+            .returning(
+                models.Wallet.id,
+                models.Wallet.user_id,
+                models.Wallet.balance,
+                models.Wallet.currency,
+                models.Wallet.version,
+            )
+        )
+        wallets.update({row.user_id: row for row in result})
+    await db.commit()
+    for wallet in wallets.values():
+        cache.store_wallet(wallet, written=True)
+
+    return [
+        {
+            "user_id": user_id,
+            "status": "credited" if user_id in wallets else "not_found",
+            "balance": wallets[user_id].balance if user_id in wallets else None,
+        }
+        for user_id in user_ids
+    ]
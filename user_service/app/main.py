@@ -1,18 +1,23 @@
 from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from . import crud, models, schemas, auth
-from .database import get_db, engine
+from typing import Optional
+from . import crud, models, schemas, cache
+from .database import get_db, engine, async_session
+from common import auth, database, metrics, passwords, tracing
 import os
 import logging
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format=tracing.LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 ROOT_PATH = os.getenv("ROOT_PATH", "")
 app = FastAPI(root_path=ROOT_PATH)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware, service_name="user_service")
 
 router = APIRouter()
 
@@ -24,6 +29,21 @@ class BalanceUpdate(BaseModel):
 async def startup():
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+    await tracing.processor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await tracing.processor.shutdown()
+
+
+@app.exception_handler(passwords.PasswordHasherBusy)
+async def password_hasher_busy_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many concurrent password operations"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @router.post("/users/", response_model=schemas.User)
@@ -39,7 +59,9 @@ async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
 ):
     user = await crud.get_user_by_email(db, email=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    if not user or not await passwords.hasher.verify(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -55,6 +77,14 @@ async def get_current_user(user: auth.User = Depends(auth.get_current_user)):
     return user
 
 
+def is_admin(user: auth.User = Depends(auth.get_current_user)):
+    if user.role != "admin":
+        raise HTTPException(
+            status_code=403, detail="The user doesn't have enough privileges"
+        )
+    return user
+
+
 @router.get("/users/me", response_model=schemas.User)
 async def read_users_me(
     current_user: models.User = Depends(get_current_user),
@@ -64,13 +94,25 @@ async def read_users_me(
     return user
 
 
+async def load_wallet(user_id: int):
+    async with async_session() as db:
+        db_wallet = await crud.get_wallet_by_user_id(db, user_id=user_id)
+    return cache.store_wallet(db_wallet) if db_wallet is not None else None
+
+
 @router.get("/users/me/wallet", response_model=schemas.Wallet)
 async def read_user_wallet(
+    min_version: Optional[int] = None,
     current_user: models.User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
 ):
-    user = await crud.get_user_by_email(db, email=current_user.email)
-    return user.wallet
+    wallet = cache.get_wallet(current_user.id, min_version=min_version)
+    if wallet is None:
+        wallet = await cache.wallet_loads.do(
+            (current_user.id, cache.generation), lambda: load_wallet(current_user.id)
+        )
+        if wallet is None:
+            raise HTTPException(status_code=404, detail="User wallet not found")
+    return wallet
 
 
 @router.patch("/users/me/wallet", response_model=schemas.Wallet)
@@ -83,6 +125,20 @@ async def update_user_wallet(
         db, user_id=current_user.id, amount=balance_update.amount
     )
 
+@router.post("/users/me/wallet/debit", response_model=schemas.Wallet)
+async def debit_user_wallet(
+    debit: schemas.WalletDebit,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    wallet = await crud.debit_wallet(db, user_id=current_user.id, amount=debit.amount)
+    if wallet is None:
+        if not await crud.wallet_exists(db, user_id=current_user.id):
+            raise HTTPException(status_code=404, detail="User wallet not found")
+        raise HTTPException(status_code=409, detail="Insufficient funds")
+    return wallet
+
+
 @router.patch("/users/{user_id}/wallet", response_model=schemas.Wallet)
 async def update_specific_user_wallet(
     user_id: int,
@@ -100,6 +156,22 @@ async def update_specific_user_wallet(
     return updated_wallet
 
 
+@router.post(
+    "/wallets/credits",
+    response_model=schemas.WalletCreditBatchResult,
+    dependencies=[Depends(is_admin)],
+)
+async def credit_wallets(
+    batch: schemas.WalletCreditBatch,
+    db: AsyncSession = Depends(get_db),
+):
+    results = await crud.credit_wallets(
+        db, credits=batch.credits, batch_key=batch.batch_key
+    )
+    if results is None:
+        return {"results": [], "duplicate": True}
+    return {"results": results}
+
 
 @router.get("/auth/validate")
 async def validate_token(current_user: models.User = Depends(get_current_user)):
@@ -111,4 +183,29 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return metrics.metrics_response(engine=engine)
+
+
+@app.get("/internal/auth-cache")
+async def auth_cache_stats():
+    return auth.token_cache.stats()
+
+
+@app.get("/internal/db-pool")
+async def db_pool_stats():
+    return database.pool_stats(engine)
+
+
+@app.get("/internal/cache")
+async def cache_stats():
+    return cache.stats()
+
+
+@app.get("/internal/password-hasher")
+async def password_hasher_stats():
+    return passwords.hasher.stats()
+
+
 app.include_router(router)
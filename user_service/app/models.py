@@ -30,4 +30,12 @@ class Wallet(Base):
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
     balance = Column(Numeric(10, 2), nullable=False, default=0.00)
     currency = Column(String(3), nullable=False, default="RUB")
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     user = relationship("User", back_populates="wallet")
+
+
+class WalletCreditBatchKey(Base):
+    __tablename__ = "wallet_credit_batches"
+
+    key = Column(String(255), primary_key=True)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
+from typing import List, Optional
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -31,6 +32,32 @@ class Wallet(BaseModel):
     user_id: int
     balance: float
     currency: str
+    version: int
 
     class Config:
         from_attributes = True
+
+
+class WalletDebit(BaseModel):
+    amount: float = Field(gt=0)
+
+
+class WalletCredit(BaseModel):
+    user_id: int
+    amount: float = Field(gt=0)
+
+
+class WalletCreditBatch(BaseModel):
+    credits: List[WalletCredit]
+    batch_key: Optional[str] = Field(None, max_length=255)
+
+
+class WalletCreditResult(BaseModel):
+    user_id: int
+    status: str
+    balance: Optional[float] = None
+
+
+class WalletCreditBatchResult(BaseModel):
+    results: List[WalletCreditResult]
+    duplicate: bool = False